@@ -19,9 +19,22 @@ CELERY_ENABLE_UTC = config('CELERY_ENABLE_UTC', default=True, cast=bool)
 
 
 CELERY_BEAT_SCHEDULE = {
+    # Сверщик расписания: сами рассылки запускаются задачами с ETA
     'send-scheduled-mailings': {
         'task': 'mailing.tasks.send_scheduled_mailings',
-        'schedule': 30.0,
+        'schedule': 300.0,
+    },
+    'rollup-attempt-statistics': {
+        'task': 'mailing.tasks.rollup_attempt_statistics',
+        'schedule': 300.0,
+    },
+    'requeue-overdue-retries': {
+        'task': 'mailing.tasks.requeue_overdue_retries',
+        'schedule': 600.0,
+    },
+    'archive-old-attempts': {
+        'task': 'mailing.tasks.archive_old_attempts',
+        'schedule': 86400.0,
     },
 }
 
@@ -46,6 +59,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "mailing.middleware.ViewMetricsMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -90,12 +104,25 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "unique-snowflake",
+# Общий для всех процессов (gunicorn, Celery) кеш: Redis, если задан
+# CACHE_REDIS_URL, иначе файловый кеш на локальном диске.
+CACHE_REDIS_URL = config("CACHE_REDIS_URL", default="")
+if CACHE_REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": config("CACHE_DIR", default=str(BASE_DIR / ".cache")),
+        }
     }
-}
+
+HOME_STATS_CACHE_TIMEOUT = config("HOME_STATS_CACHE_TIMEOUT", default=3600, cast=int)
 
 DATETIME_INPUT_FORMATS = [
     '%Y-%m-%d %H:%M:%S', # Стандартный формат Django
@@ -126,5 +153,89 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 
+# Отправка рассылок
+MAILING_SEND_BATCH_SIZE = config("MAILING_SEND_BATCH_SIZE", default=100, cast=int)
+MAILING_SMTP_POOL_SIZE = config("MAILING_SMTP_POOL_SIZE", default=1, cast=int)
+MAILING_SMTP_MAX_MESSAGES_PER_CONNECTION = config(
+    "MAILING_SMTP_MAX_MESSAGES_PER_CONNECTION", default=500, cast=int
+)
+# Движок отправки: "pool" — последовательно через пул соединений,
+# "threads" (прежнее имя "async") — до MAILING_ASYNC_CONCURRENCY SMTP-сессий
+# одновременно в пуле потоков.
+MAILING_DELIVERY_ENGINE = config("MAILING_DELIVERY_ENGINE", default="pool")
+MAILING_ASYNC_CONCURRENCY = config("MAILING_ASYNC_CONCURRENCY", default=10, cast=int)
+MAILING_FANOUT = config("MAILING_FANOUT", default=False, cast=bool)
+MAILING_FANOUT_CHUNK_SIZE = config("MAILING_FANOUT_CHUNK_SIZE", default=1000, cast=int)
+# Fan-out по доменам получателей (вместе с MAILING_FANOUT): каждая часть
+# содержит получателей одного домена и отправляется через одно
+# переиспользуемое соединение. Домены, где получателей меньше
+# MAILING_DOMAIN_PARTITION_MIN_SIZE, собираются в общие части.
+MAILING_FANOUT_BY_DOMAIN = config("MAILING_FANOUT_BY_DOMAIN", default=False, cast=bool)
+MAILING_DOMAIN_PARTITION_MIN_SIZE = config("MAILING_DOMAIN_PARTITION_MIN_SIZE", default=100, cast=int)
+# Отдельные маршруты (релеи) для доменов: параметры get_connection
+MAILING_DOMAIN_ROUTES = {
+    # "gmail.com": {"host": "relay-gmail.internal", "port": 25},
+}
+# Запуск рассылок задачами Celery с ETA на next_run_at. Задачи ставятся не
+# дальше MAILING_SCHEDULE_HORIZON секунд вперёд (меньше visibility_timeout
+# брокера Redis, иначе задачу выдадут повторно). Рассылки, не запущенные
+# через MAILING_SCHEDULE_GRACE секунд после срока, запускает сверщик.
+MAILING_SCHEDULE_HORIZON = config("MAILING_SCHEDULE_HORIZON", default=1800, cast=int)
+MAILING_SCHEDULE_GRACE = config("MAILING_SCHEDULE_GRACE", default=60, cast=int)
+# Время аренды рассылки воркером, с. Продлевается после каждой пачки писем.
+MAILING_CLAIM_LEASE = config("MAILING_CLAIM_LEASE", default=900, cast=int)
+# Лимиты отправки, писем в минуту (0 — без ограничения): на почтовый релей
+# EMAIL_HOST, на отдельные домены получателей и на любой другой домен.
+# Ведра токенов хранятся в кеше и общие для всех воркеров.
+MAILING_RATE_LIMIT_RELAY = config("MAILING_RATE_LIMIT_RELAY", default=0, cast=int)
+MAILING_RATE_LIMIT_DOMAINS = {
+    # "gmail.com": 600,
+}
+MAILING_RATE_LIMIT_DEFAULT_DOMAIN = config("MAILING_RATE_LIMIT_DEFAULT_DOMAIN", default=0, cast=int)
+# Повторы после временных ошибок (ответ SMTP 4xx, обрыв, таймаут): не больше
+# MAILING_RETRY_MAX_ATTEMPTS на получателя, задержка удваивается от
+# MAILING_RETRY_BASE_DELAY до MAILING_RETRY_MAX_DELAY секунд. Повторы,
+# просроченные больше чем на MAILING_RETRY_GRACE секунд, ставятся в очередь заново.
+# Захваченный воркером повтор арендуется на MAILING_RETRY_GRACE секунд.
+MAILING_RETRY_MAX_ATTEMPTS = config("MAILING_RETRY_MAX_ATTEMPTS", default=5, cast=int)
+MAILING_RETRY_BASE_DELAY = config("MAILING_RETRY_BASE_DELAY", default=60, cast=int)
+MAILING_RETRY_MAX_DELAY = config("MAILING_RETRY_MAX_DELAY", default=3600, cast=int)
+MAILING_RETRY_GRACE = config("MAILING_RETRY_GRACE", default=600, cast=int)
+# Адреса с постоянным отказом (5xx на RCPT) добавляются в общий список подавления
+MAILING_SUPPRESS_HARD_BOUNCES = config("MAILING_SUPPRESS_HARD_BOUNCES", default=True, cast=bool)
+
+MAILING_ATTEMPT_FLUSH_SIZE = config("MAILING_ATTEMPT_FLUSH_SIZE", default=500, cast=int)
+MAILING_ATTEMPT_FLUSH_INTERVAL = config("MAILING_ATTEMPT_FLUSH_INTERVAL", default=5.0, cast=float)
+
+# Агрегация статистики: размер пачки и задержка, после которой попытка
+# считается зафиксированной и учитывается в статистике, с
+MAILING_ROLLUP_BATCH_SIZE = config("MAILING_ROLLUP_BATCH_SIZE", default=10000, cast=int)
+MAILING_ROLLUP_LAG = config("MAILING_ROLLUP_LAG", default=60, cast=int)
+
+# Импорт клиентов из CSV: строк в одной пачке вставки
+CLIENT_IMPORT_CHUNK_SIZE = config("CLIENT_IMPORT_CHUNK_SIZE", default=1000, cast=int)
+
+# Выгрузка попыток: строк, читаемых из базы за один раз
+MAILING_EXPORT_CHUNK_SIZE = config("MAILING_EXPORT_CHUNK_SIZE", default=2000, cast=int)
+
+# Хранение попыток: попытки старше MAILING_ATTEMPT_RETENTION_DAYS дней
+# (0 — хранить всегда) переносятся в gzip JSONL под MEDIA_ROOT/MAILING_ARCHIVE_DIR
+# и удаляются пачками по MAILING_ARCHIVE_BATCH_SIZE. Пауза между пачками (с)
+# даёт другим процессам получить блокировку записи SQLite.
+MAILING_ATTEMPT_RETENTION_DAYS = config("MAILING_ATTEMPT_RETENTION_DAYS", default=0, cast=int)
+MAILING_ARCHIVE_DIR = config("MAILING_ARCHIVE_DIR", default="attempt_archive")
+MAILING_ARCHIVE_BATCH_SIZE = config("MAILING_ARCHIVE_BATCH_SIZE", default=1000, cast=int)
+MAILING_ARCHIVE_BATCH_PAUSE = config("MAILING_ARCHIVE_BATCH_PAUSE", default=0.05, cast=float)
+
+# Метрики в формате Prometheus (/mailing/metrics/). Каждый процесс копит
+# значения в памяти и раз в MAILING_METRICS_FLUSH_INTERVAL секунд сохраняет
+# их в свой файл в MAILING_METRICS_DIR; эндпоинт суммирует файлы всех
+# процессов, поэтому каталог должен быть общим для веб-сервера и воркеров.
+# Без MAILING_METRICS_TOKEN метрики доступны только вошедшим пользователям,
+# с ним — также по заголовку "Authorization: Bearer <токен>".
+MAILING_METRICS_DIR = config("MAILING_METRICS_DIR", default=str(BASE_DIR / ".metrics"))
+MAILING_METRICS_FLUSH_INTERVAL = config("MAILING_METRICS_FLUSH_INTERVAL", default=10.0, cast=float)
+MAILING_METRICS_TOKEN = config("MAILING_METRICS_TOKEN", default="")
+
 LOGIN_REDIRECT_URL = "mailing:home"
 LOGOUT_REDIRECT_URL = "mailing:home"
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Client, Mailing, MailingAttempt, Message
+from .models import Client, Delivery, Mailing, MailingAttempt, Message, Suppression
 
 
 @admin.register(Client)
@@ -18,12 +18,40 @@ class MessageAdmin(admin.ModelAdmin):
 
 @admin.register(Mailing)
 class MailingAdmin(admin.ModelAdmin):
-    list_display = ("id", "first_send_time", "end_time", "status", "message")
+    list_display = (
+        "id",
+        "first_send_time",
+        "end_time",
+        "status",
+        "message",
+        "successful_attempts",
+        "failed_attempts",
+    )
     list_filter = ("status", "first_send_time")
+    list_select_related = ("message",)
+    readonly_fields = ("total_attempts", "successful_attempts", "failed_attempts")
 
 
 @admin.register(MailingAttempt)
 class MailingAttemptAdmin(admin.ModelAdmin):
     list_display = ("id", "attempt_time", "status", "mailing")
+    list_select_related = ("mailing__message",)
     list_filter = ("status", "attempt_time")
     readonly_fields = ("attempt_time", "status", "server_response", "mailing")
+
+
+@admin.register(Delivery)
+class DeliveryAdmin(admin.ModelAdmin):
+    list_display = ("id", "mailing", "client", "state", "retries", "next_retry_at", "updated_at")
+    list_select_related = ("mailing__message", "client")
+    list_filter = ("state",)
+    readonly_fields = ("mailing", "client", "state", "retries", "next_retry_at", "updated_at")
+
+
+@admin.register(Suppression)
+class SuppressionAdmin(admin.ModelAdmin):
+    list_display = ("email", "owner", "reason", "created_at")
+    list_select_related = ("owner",)
+    list_filter = ("reason",)
+    search_fields = ("email",)
+    raw_id_fields = ("owner",)
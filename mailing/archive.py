@@ -0,0 +1,89 @@
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .exporters import iter_rows
+from .models import MailingAttempt, RollupCheckpoint
+from .rollups import CHECKPOINT_NAME, rollup_attempts
+
+logger = logging.getLogger(__name__)
+
+
+def archive_path(now):
+    """
+    Файл архива одного запуска: MEDIA_ROOT/MAILING_ARCHIVE_DIR/attempts-<время>.jsonl.gz.
+    """
+    directory = Path(settings.MEDIA_ROOT) / settings.MAILING_ARCHIVE_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"attempts-{now:%Y%m%dT%H%M%S}.jsonl.gz"
+
+
+def archive_attempts(retention_days=None, batch_size=None):
+    """
+    Переносит попытки старше retention_days дней в сжатый JSONL-архив под
+    MEDIA_ROOT и удаляет их из базы. Возвращает (количество, путь к архиву).
+
+    Архивируются только попытки, уже учтённые в статистике (не новее отметки
+    агрегации), поэтому статистика и пересчёт счётчиков остаются верными.
+    Каждая пачка сначала записывается на диск, затем удаляется отдельной
+    короткой транзакцией: запись в базу блокируется ненадолго, а при сбое
+    строки не теряются (в худшем случае попадут в архив повторно).
+    """
+    if retention_days is None:
+        retention_days = settings.MAILING_ATTEMPT_RETENTION_DAYS
+    batch_size = batch_size or settings.MAILING_ARCHIVE_BATCH_SIZE
+    if not retention_days:
+        return 0, None
+
+    rollup_attempts()
+    now = timezone.now()
+    checkpoint = (
+        RollupCheckpoint.objects.filter(name=CHECKPOINT_NAME)
+        .values_list("last_attempt_id", flat=True)
+        .first()
+    )
+    if not checkpoint:
+        return 0, None
+
+    attempts = MailingAttempt.objects.filter(
+        id__lte=checkpoint, attempt_time__lt=now - timedelta(days=retention_days)
+    ).order_by("id")
+
+    archived = 0
+    path = None
+    stream = None
+    last_id = 0
+    try:
+        while True:
+            rows = list(iter_rows(attempts.filter(id__gt=last_id)[:batch_size], batch_size))
+            if not rows:
+                break
+            if stream is None:
+                path = archive_path(now)
+                stream = gzip.open(path, "at", encoding="utf-8")
+
+            stream.writelines(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+            stream.flush()
+            os.fsync(stream.fileno())
+
+            ids = [row["id"] for row in rows]
+            with transaction.atomic():
+                MailingAttempt.objects.filter(id__in=ids).delete()
+            archived += len(ids)
+            last_id = ids[-1]
+            time.sleep(settings.MAILING_ARCHIVE_BATCH_PAUSE)
+    finally:
+        if stream is not None:
+            stream.close()
+
+    if archived:
+        logger.info(f"В архив {path} перенесено попыток: {archived}")
+    return archived, path
@@ -0,0 +1,394 @@
+import statistics
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import EmailMessage, get_connection, send_mail
+from django.db import connection, transaction
+from django.template import Context, Engine
+from django.test import Client as TestClient, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .fake_smtp import FakeSMTPServer
+from .models import Client, Mailing, Message
+from .personalization import CompiledTemplate
+from .seeding import seed
+from .services import (
+    Recipient,
+    SMTPConnectionPool,
+    ThreadedDeliveryEngine,
+    claim_mailing,
+    due_mailings,
+    send_mailing,
+)
+from .stats import invalidate_home_stats
+from .tasks import send_scheduled_mailings
+
+SMTP_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+LOCMEM_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+
+# Реестр бенчмарков: имя -> функция, возвращающая словарь с результатами.
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return decorator
+
+
+def rate(count, elapsed):
+    return round(count / elapsed, 1) if elapsed else None
+
+
+@contextmanager
+def rollback_after():
+    """
+    Выполняет блок в транзакции и откатывает её: бенчмарки не оставляют
+    данных в базе.
+    """
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def latency_summary(samples):
+    """
+    Среднее, медиана, 95-й перцентиль и максимум задержек в миллисекундах.
+    """
+    samples = sorted(samples)
+    return {
+        "mean_ms": round(statistics.fmean(samples) * 1000, 2),
+        "p50_ms": round(statistics.median(samples) * 1000, 2),
+        "p95_ms": round(samples[min(int(len(samples) * 0.95), len(samples) - 1)] * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2),
+    }
+
+
+def create_due_mailings(count, recipients=0):
+    """
+    Создаёт count рассылок, время запуска которых наступило, с общим
+    списком из recipients клиентов.
+    """
+    run = uuid.uuid4().hex[:8]
+    owner = get_user_model().objects.create(username=f"bench-{run}", email=f"bench-{run}@bench.local")
+    message = Message.objects.create(
+        subject="Benchmark", body="Здравствуйте, {{ full_name }}! Тестовое письмо.", owner=owner
+    )
+    clients = Client.objects.bulk_create(
+        Client(email=f"{run}-client{i}@example.com", full_name=f"Клиент {i}", owner=owner)
+        for i in range(recipients)
+    )
+    now = timezone.now()
+    mailings = Mailing.objects.bulk_create(
+        Mailing(
+            first_send_time=now - timedelta(minutes=10),
+            end_time=now + timedelta(days=1),
+            next_run_at=now - timedelta(minutes=10),
+            status="running",
+            message=message,
+            owner=owner,
+        )
+        for _ in range(count)
+    )
+    Mailing.clients.through.objects.bulk_create(
+        Mailing.clients.through(mailing_id=mailing.id, client_id=client.id)
+        for mailing in mailings
+        for client in clients
+    )
+    return mailings
+
+
+def build_messages(count):
+    return [
+        EmailMessage(
+            subject="Benchmark",
+            body="Тестовое письмо",
+            from_email="bench@example.com",
+            to=[f"client{i}@example.com"],
+        )
+        for i in range(count)
+    ]
+
+
+@benchmark("smtp_pool")
+def smtp_pool(count=1000, latency=0.0, **kwargs):
+    """
+    Отправка count писем на локальную заглушку SMTP: по одному соединению
+    на письмо (send_mail) против пула соединений.
+    """
+    results = {"messages": count, "latency": latency}
+
+    with FakeSMTPServer(latency=latency) as server:
+        started = time.perf_counter()
+        for i in range(count):
+            send_mail(
+                subject="Benchmark",
+                message="Тестовое письмо",
+                from_email="bench@example.com",
+                recipient_list=[f"client{i}@example.com"],
+                connection=get_connection(SMTP_BACKEND, host=server.host, port=server.port),
+            )
+        elapsed = time.perf_counter() - started
+        results["send_mail"] = {
+            "seconds": round(elapsed, 4),
+            "emails_per_second": rate(count, elapsed),
+            "connections": server.connection_count,
+        }
+
+    with FakeSMTPServer(latency=latency) as server:
+        messages = build_messages(count)
+        started = time.perf_counter()
+        with SMTPConnectionPool(backend=SMTP_BACKEND, host=server.host, port=server.port) as pool:
+            errors = [error for error in pool.send_messages(messages) if error is not None]
+        elapsed = time.perf_counter() - started
+        results["pool"] = {
+            "seconds": round(elapsed, 4),
+            "emails_per_second": rate(count, elapsed),
+            "connections": server.connection_count,
+            "errors": len(errors),
+        }
+
+    return results
+
+
+@benchmark("delivery_engines")
+def delivery_engines(count=1000, latency=0.0, concurrency=10, **kwargs):
+    """
+    Последовательный пул соединений против движка в пуле потоков с
+    concurrency одновременными SMTP-сессиями на заглушке с задержкой latency.
+    """
+    results = {"messages": count, "latency": latency, "concurrency": concurrency}
+    engines = {
+        "pool": lambda server: SMTPConnectionPool(
+            backend=SMTP_BACKEND, host=server.host, port=server.port
+        ),
+        "threads": lambda server: ThreadedDeliveryEngine(
+            concurrency=concurrency, backend=SMTP_BACKEND, host=server.host, port=server.port
+        ),
+    }
+
+    for name, make_engine in engines.items():
+        with FakeSMTPServer(latency=latency) as server:
+            messages = build_messages(count)
+            started = time.perf_counter()
+            with make_engine(server) as engine:
+                errors = [error for error in engine.send_messages(messages) if error is not None]
+            elapsed = time.perf_counter() - started
+            results[name] = {
+                "seconds": round(elapsed, 4),
+                "emails_per_second": rate(count, elapsed),
+                "connections": server.connection_count,
+                "errors": len(errors),
+            }
+
+    return results
+
+
+@benchmark("claims")
+def claims(count=1000, **kwargs):
+    """
+    Накладные расходы захвата рассылок: выборка due-рассылок тиком,
+    захват каждой и повторная попытка захвата (как у второго воркера).
+    """
+    results = {"mailings": count}
+
+    with rollback_after():
+        create_due_mailings(count)
+
+        started = time.perf_counter()
+        mailing_ids = list(due_mailings().values_list("id", flat=True))
+        results["select_due_seconds"] = round(time.perf_counter() - started, 4)
+
+        started = time.perf_counter()
+        claimed = sum(claim_mailing(mailing_id) is not None for mailing_id in mailing_ids)
+        elapsed = time.perf_counter() - started
+        results["claim"] = {
+            "claimed": claimed,
+            "seconds": round(elapsed, 4),
+            "microseconds_per_claim": round(elapsed / len(mailing_ids) * 1e6, 1),
+        }
+
+        started = time.perf_counter()
+        stolen = sum(claim_mailing(mailing_id) is not None for mailing_id in mailing_ids)
+        elapsed = time.perf_counter() - started
+        results["contended_claim"] = {
+            "claimed": stolen,
+            "seconds": round(elapsed, 4),
+            "microseconds_per_claim": round(elapsed / len(mailing_ids) * 1e6, 1),
+        }
+
+    return results
+
+
+@benchmark("personalization")
+def personalization(count=100_000, **kwargs):
+    """
+    Персонализация count писем: разбор шаблона Django для каждого получателя
+    против шаблона, скомпилированного один раз.
+    """
+    subject = "{{ full_name }}, новости недели"
+    body = "Здравствуйте, {{ full_name }}!\n\n" + "Текст письма. " * 50 + "\nАдрес: {{ email }}"
+    recipients = [Recipient(i, f"client{i}@example.com", f"Клиент {i}") for i in range(count)]
+    results = {"messages": count}
+
+    engine = Engine(autoescape=False)
+    started = time.perf_counter()
+    for recipient in recipients:
+        context = Context(recipient._asdict())
+        engine.from_string(subject).render(context)
+        engine.from_string(body).render(context)
+    elapsed = time.perf_counter() - started
+    results["parse_per_recipient"] = {"seconds": round(elapsed, 4), "renders_per_second": rate(count, elapsed)}
+
+    started = time.perf_counter()
+    compiled_subject, compiled_body = CompiledTemplate(subject), CompiledTemplate(body)
+    for recipient in recipients:
+        compiled_subject.render(recipient)
+        compiled_body.render(recipient)
+    elapsed = time.perf_counter() - started
+    results["compiled"] = {"seconds": round(elapsed, 4), "renders_per_second": rate(count, elapsed)}
+
+    return results
+
+
+@contextmanager
+def email_backend(name, latency=0.0):
+    """
+    Почтовые настройки бенчмарка: бэкенд locmem или SMTP на локальную
+    заглушку. Возвращает заглушку SMTP или None.
+    """
+    if name == "locmem":
+        with override_settings(EMAIL_BACKEND=LOCMEM_BACKEND):
+            yield None
+        mail.outbox = []
+        return
+
+    with FakeSMTPServer(latency=latency) as server, override_settings(
+        EMAIL_BACKEND=SMTP_BACKEND,
+        EMAIL_HOST=server.host,
+        EMAIL_PORT=server.port,
+        EMAIL_HOST_USER="",
+        EMAIL_USE_TLS=False,
+        EMAIL_USE_SSL=False,
+    ):
+        yield server
+
+
+@benchmark("send_mailing")
+def send_throughput(count=1000, latency=0.0, **kwargs):
+    """
+    Пропускная способность send_mailing на рассылке из count получателей:
+    с бэкендом locmem (без сети) и через SMTP на локальную заглушку.
+    Включает чтение получателей, персонализацию и запись попыток.
+    """
+    results = {"messages": count, "latency": latency}
+
+    for name in ("locmem", "smtp"):
+        with rollback_after():
+            (mailing,) = create_due_mailings(1, recipients=count)
+            with email_backend(name, latency) as server:
+                started = time.perf_counter()
+                send_mailing(mailing.id)
+                elapsed = time.perf_counter() - started
+            mailing.refresh_from_db()
+            results[name] = {
+                "seconds": round(elapsed, 4),
+                "emails_per_second": rate(count, elapsed),
+                "successful": mailing.successful_attempts,
+                "failed": mailing.failed_attempts,
+            }
+            if server is not None:
+                results[name]["connections"] = server.connection_count
+
+    return results
+
+
+@benchmark("scheduler_tick")
+def scheduler_tick(count=100, recipients=10, **kwargs):
+    """
+    Задержка тика сверщика send_scheduled_mailings: тик с count
+    просроченными рассылками по recipients получателей, задачи ETA которых
+    потеряны (бэкенд locmem), и следующий за ним холостой тик.
+    """
+    results = {"mailings": count, "recipients": recipients}
+
+    with rollback_after(), email_backend("locmem"), override_settings(MAILING_FANOUT=False):
+        create_due_mailings(count, recipients=recipients)
+
+        started = time.perf_counter()
+        send_scheduled_mailings()
+        elapsed = time.perf_counter() - started
+        results["busy_tick"] = {
+            "seconds": round(elapsed, 4),
+            "milliseconds_per_mailing": round(elapsed / count * 1000, 2),
+            "emails_per_second": rate(count * recipients, elapsed),
+        }
+
+        samples = []
+        for _ in range(20):
+            started = time.perf_counter()
+            send_scheduled_mailings()
+            samples.append(time.perf_counter() - started)
+        results["idle_tick"] = latency_summary(samples)
+
+    return results
+
+
+@benchmark("views")
+def views(count=20, **kwargs):
+    """
+    Задержка страниц списков и статистики на синтетических данных
+    seed(): count запросов к каждой странице после одного прогревочного,
+    плюс число SQL-запросов страницы.
+    """
+    url_names = [
+        "home",
+        "client_list",
+        "message_list",
+        "mailing_list",
+        "attempt_list",
+        "statistics",
+        "statistics_timeseries",
+    ]
+    results = {"requests": count}
+
+    with rollback_after(), override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+        dataset = seed(
+            users=2,
+            clients_per_user=2000,
+            mailings_per_user=200,
+            recipients_per_mailing=200,
+            attempts_per_mailing=50,
+            random_seed=0,
+        )
+        results["dataset"] = dataset.as_dict()
+        invalidate_home_stats()
+
+        client = TestClient()
+        client.force_login(get_user_model().objects.get(username=f"seed-{dataset.run}-0"))
+        for name in url_names:
+            url = reverse(f"mailing:{name}")
+            client.get(url)
+            samples = []
+            for _ in range(count):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = client.get(url)
+                    samples.append(time.perf_counter() - started)
+            results[name] = {
+                "status": response.status_code,
+                "queries": len(queries),
+                **latency_summary(samples),
+            }
+    invalidate_home_stats()
+
+    return results
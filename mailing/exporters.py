@@ -0,0 +1,70 @@
+import csv
+import json
+
+from django.conf import settings
+
+from .models import MailingAttempt
+
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_FIELDS = ("id", "attempt_time", "status", "mailing_id", "owner_id", "server_response")
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+
+class Echo:
+    """
+    Псевдо-файл для csv.writer: write возвращает строку, а не пишет её.
+    """
+
+    def write(self, value):
+        return value
+
+
+def filter_attempts(queryset=None, mailing_id=None, owner_id=None, status=None, since=None, until=None):
+    """
+    Попытки с фильтрами по рассылке, владельцу, статусу и интервалу времени
+    [since, until). Пустые фильтры не применяются. Порядок — по id.
+    """
+    queryset = MailingAttempt.objects.all() if queryset is None else queryset
+    if mailing_id is not None:
+        queryset = queryset.filter(mailing_id=mailing_id)
+    if owner_id is not None:
+        queryset = queryset.filter(mailing__owner_id=owner_id)
+    if status:
+        queryset = queryset.filter(status=status)
+    if since is not None:
+        queryset = queryset.filter(attempt_time__gte=since)
+    if until is not None:
+        queryset = queryset.filter(attempt_time__lt=until)
+    return queryset.order_by("id")
+
+
+def iter_rows(queryset, chunk_size=None):
+    """
+    Строки выгрузки через .iterator(): в памяти не больше chunk_size попыток.
+    """
+    chunk_size = chunk_size or settings.MAILING_EXPORT_CHUNK_SIZE
+    rows = queryset.values_list(
+        "id", "attempt_time", "status", "mailing_id", "mailing__owner_id", "server_response"
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield dict(zip(EXPORT_FIELDS, row), attempt_time=row[1].isoformat())
+
+
+def export_lines(queryset, export_format="csv", chunk_size=None):
+    """
+    Генератор строк выгрузки попыток в формате csv (с заголовком) или jsonl.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {export_format}")
+
+    if export_format == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for row in iter_rows(queryset, chunk_size):
+            yield writer.writerow(row[field] for field in EXPORT_FIELDS)
+    else:
+        for row in iter_rows(queryset, chunk_size):
+            yield json.dumps(row, ensure_ascii=False) + "\n"
@@ -0,0 +1,118 @@
+import socketserver
+import threading
+import time
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Минимальный SMTP-диалог: HELO/EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT.
+    """
+
+    def reply(self, line):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        connection_id = self.server.register_connection()
+        self.reply("220 fake-smtp ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+
+            if verb == "EHLO":
+                self.wfile.write(b"250-fake-smtp\r\n")
+                self.reply("250 8BITMIME")
+            elif verb in ("HELO", "MAIL", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[-1].strip(" <>")
+                if address in self.server.reject:
+                    self.reply("550 Mailbox unavailable")
+                elif address in self.server.defer:
+                    self.reply("450 Mailbox busy, try again later")
+                else:
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                self.server.register_message(connection_id)
+                self.reply("250 OK: queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                break
+            else:
+                self.reply("502 Command not implemented")
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    Локальная заглушка SMTP-сервера для бенчмарков и проверок.
+
+    Письма никуда не доставляются, сервер только считает соединения и
+    принятые сообщения по каждому соединению. ``latency`` — задержка перед
+    каждым ответом сервера (имитация сетевой задержки), ``reject`` —
+    адреса, которые сервер отклоняет с кодом 550, ``defer`` — адреса,
+    временно отклоняемые с кодом 450.
+
+    Пример::
+
+        with FakeSMTPServer(latency=0.001) as server:
+            connection = get_connection(host=server.host, port=server.port)
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, reject=(), defer=()):
+        super().__init__((host, port), _SMTPHandler)
+        self.latency = latency
+        self.reject = set(reject)
+        self.defer = set(defer)
+        self.messages_per_connection = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def host(self):
+        return self.server_address[0]
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    @property
+    def connection_count(self):
+        return len(self.messages_per_connection)
+
+    @property
+    def message_count(self):
+        return sum(self.messages_per_connection)
+
+    def register_connection(self):
+        with self._lock:
+            self.messages_per_connection.append(0)
+            return len(self.messages_per_connection) - 1
+
+    def register_message(self, connection_id):
+        with self._lock:
+            self.messages_per_connection[connection_id] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -1,5 +1,6 @@
 from django import forms
-from .models import Client, Message, Mailing
+from .exporters import EXPORT_FORMATS
+from .models import Client, Message, Mailing, MailingAttempt
 
 class ClientForm(forms.ModelForm):
     class Meta:
@@ -11,12 +12,15 @@ class MessageForm(forms.ModelForm):
     class Meta:
         model = Message
         fields = ['subject', 'body'] # owner не включаем
+        help_texts = {
+            'body': 'Можно использовать {{ full_name }} и {{ email }} получателя.',
+        }
 
 
 class MailingForm(forms.ModelForm):
     class Meta:
         model = Mailing
-        fields = ['first_send_time', 'end_time', 'message', 'clients']
+        fields = ['first_send_time', 'end_time', 'periodicity', 'message', 'clients']
         widgets = {
             'first_send_time': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
             'end_time': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
@@ -31,4 +35,31 @@ class MailingForm(forms.ModelForm):
             self.fields['clients'].queryset = self.fields['clients'].queryset.filter(owner_id=self.owner_id)
 
 
+class ClientImportForm(forms.Form):
+    file = forms.FileField(label='CSV-файл', help_text='Колонки: email, full_name, comment')
+    mailing = forms.ModelChoiceField(
+        queryset=Mailing.objects.none(), required=False, label='Добавить в рассылку'
+    )
+
+    def __init__(self, *args, **kwargs):
+        owner_id = kwargs.pop('owner_id')
+        super().__init__(*args, **kwargs)
+        self.fields['mailing'].queryset = Mailing.objects.filter(owner_id=owner_id).select_related('message')
+
+
+class AttemptExportForm(forms.Form):
+    """
+    Фильтры выгрузки попыток. Интервал времени — [since, until).
+    """
 
+    mailing = forms.IntegerField(required=False, min_value=1, label='ID рассылки')
+    owner = forms.IntegerField(required=False, min_value=1, label='ID владельца')
+    status = forms.ChoiceField(
+        choices=[('', 'Любой')] + MailingAttempt.STATUS_CHOICES, required=False, label='Статус'
+    )
+    since = forms.DateTimeField(required=False, label='С')
+    until = forms.DateTimeField(required=False, label='По')
+    format = forms.ChoiceField(
+        choices=[(name, name) for name in EXPORT_FORMATS], required=False, label='Формат'
+    )
+    gzip = forms.BooleanField(required=False, label='Сжать gzip')
@@ -0,0 +1,122 @@
+import csv
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from .models import Client, Mailing
+from .stats import invalidate_home_stats
+
+FULL_NAME_MAX_LENGTH = Client._meta.get_field("full_name").max_length
+
+
+class ImportResult:
+    """
+    Итог импорта клиентов: добавлено, дубликатов, некорректных строк.
+    """
+
+    def __init__(self):
+        self.inserted = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.attached = 0
+
+    def __str__(self):
+        return (
+            f"Добавлено: {self.inserted}, дубликатов: {self.duplicates}, "
+            f"некорректных строк: {self.invalid}"
+        )
+
+
+def normalize_email(email):
+    return (email or "").strip().lower()
+
+
+def parse_row(row):
+    """
+    Превращает строку CSV в (email, full_name, comment) или None, если email
+    некорректен.
+    """
+    email = normalize_email(row.get("email"))
+    try:
+        validate_email(email)
+    except ValidationError:
+        return None
+    full_name = (row.get("full_name") or "").strip() or email.split("@")[0]
+    comment = (row.get("comment") or "").strip() or None
+    return email, full_name[:FULL_NAME_MAX_LENGTH], comment
+
+
+def import_clients(stream, owner, mailing=None, chunk_size=None):
+    """
+    Потоково импортирует клиентов из CSV с колонками email, full_name, comment.
+
+    Строки читаются пачками по chunk_size: email нормализуется, дубликаты
+    внутри пачки и уже существующие в базе адреса отбрасываются, новые
+    клиенты вставляются bulk_create(ignore_conflicts=True). Существующие
+    адреса сравниваются без учёта регистра: клиенты, созданные через форму,
+    могли сохраниться в исходном регистре. Если передана рассылка, клиенты
+    владельца из файла добавляются в неё пачкой строк таблицы связи.
+    Память ограничена размером пачки. bulk_create минует сигналы, поэтому
+    счётчики главной страницы сбрасываются один раз после импорта.
+    """
+    chunk_size = chunk_size or settings.CLIENT_IMPORT_CHUNK_SIZE
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames or "email" not in reader.fieldnames:
+        raise ValueError("В CSV нет колонки email.")
+
+    result = ImportResult()
+    while rows := list(islice(reader, chunk_size)):
+        import_chunk(rows, owner, mailing, result)
+    if result.inserted:
+        transaction.on_commit(invalidate_home_stats)
+    return result
+
+
+def existing_clients(emails):
+    """
+    Клиенты с адресами из emails (в нижнем регистре) без учёта регистра.
+    """
+    return Client.objects.annotate(email_lower=Lower("email")).filter(email_lower__in=emails)
+
+
+def import_chunk(rows, owner, mailing, result):
+    parsed = {}
+    for row in rows:
+        client = parse_row(row)
+        if client is None:
+            result.invalid += 1
+        elif client[0] in parsed:
+            result.duplicates += 1
+        else:
+            parsed[client[0]] = client
+
+    with transaction.atomic():
+        existing = set(existing_clients(parsed).values_list("email_lower", flat=True))
+        result.duplicates += len(existing)
+        new_clients = [
+            Client(email=email, full_name=full_name, comment=comment, owner=owner)
+            for email, full_name, comment in parsed.values()
+            if email not in existing
+        ]
+        Client.objects.bulk_create(new_clients, ignore_conflicts=True)
+        result.inserted += len(new_clients)
+
+        if mailing is not None:
+            client_ids = set(
+                existing_clients(parsed).filter(owner=owner).values_list("id", flat=True)
+            )
+            client_ids -= set(
+                Mailing.clients.through.objects.filter(
+                    mailing_id=mailing.id, client_id__in=client_ids
+                ).values_list("client_id", flat=True)
+            )
+            links = [
+                Mailing.clients.through(mailing_id=mailing.id, client_id=client_id)
+                for client_id in sorted(client_ids)
+            ]
+            Mailing.clients.through.objects.bulk_create(links, ignore_conflicts=True)
+            result.attached += len(links)
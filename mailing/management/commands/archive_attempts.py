@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mailing.archive import archive_attempts
+
+
+class Command(BaseCommand):
+    help = "Переносит старые попытки рассылок в gzip JSONL-архив под MEDIA_ROOT и удаляет их"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.MAILING_ATTEMPT_RETENTION_DAYS,
+            help="Архивировать попытки старше стольких дней (по умолчанию MAILING_ATTEMPT_RETENTION_DAYS)",
+        )
+        parser.add_argument("--batch-size", type=int, help="Попыток в одной пачке удаления")
+
+    def handle(self, *args, **options):
+        if not options["days"]:
+            self.stdout.write("Срок хранения не задан: укажите --days или MAILING_ATTEMPT_RETENTION_DAYS.")
+            return
+
+        archived, path = archive_attempts(options["days"], options["batch_size"])
+        if archived:
+            self.stdout.write(self.style.SUCCESS(f"Перенесено в архив {path} попыток: {archived}"))
+        else:
+            self.stdout.write("Нет попыток для архивации.")
@@ -0,0 +1,62 @@
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from mailing.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = "Запускает бенчмарки сервиса рассылок"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "names", nargs="*", help=f"Бенчмарки для запуска: {', '.join(BENCHMARKS)}"
+        )
+        parser.add_argument(
+            "--count", type=int, help="Объём нагрузки (по умолчанию свой у каждого бенчмарка)"
+        )
+        parser.add_argument(
+            "--latency", type=float, default=0.0, help="Задержка ответа SMTP-заглушки, с"
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=10, help="Число одновременных SMTP-сессий"
+        )
+        parser.add_argument(
+            "--output", "-o", help="Сохранить результаты в JSON-файл для сравнения запусков"
+        )
+
+    def handle(self, *args, **options):
+        names = options["names"] or list(BENCHMARKS)
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f"Неизвестные бенчмарки: {', '.join(unknown)}")
+
+        report = {
+            "started_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "options": {key: options[key] for key in ("count", "latency", "concurrency")},
+            "results": {},
+        }
+        for name in names:
+            self.stdout.write(f"Бенчмарк {name}...")
+            kwargs = {
+                key: options[key]
+                for key in ("count", "latency", "concurrency")
+                if options[key] is not None
+            }
+            result = BENCHMARKS[name](**kwargs)
+            report["results"][name] = result
+            self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
+
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Результаты сохранены в {options['output']}")
+
+        self.stdout.write(self.style.SUCCESS("Бенчмарки завершены."))
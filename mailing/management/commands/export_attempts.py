@@ -0,0 +1,62 @@
+import gzip
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from mailing.exporters import EXPORT_FORMATS, export_lines, filter_attempts
+from mailing.models import MailingAttempt
+
+
+def parse_moment(value):
+    moment = parse_datetime(value)
+    if moment is None:
+        raise CommandError(f'Некорректная дата "{value}", ожидается ISO 8601.')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = "Потоково выгружает попытки рассылок в CSV или JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", "-o", help="Файл выгрузки (по умолчанию stdout)")
+        parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv", help="Формат выгрузки")
+        parser.add_argument("--gzip", action="store_true", help="Сжать выгрузку gzip")
+        parser.add_argument("--mailing", type=int, help="ID рассылки")
+        parser.add_argument("--owner", help="Email владельца рассылок")
+        parser.add_argument(
+            "--status", choices=[status for status, _ in MailingAttempt.STATUS_CHOICES], help="Статус попытки"
+        )
+        parser.add_argument("--since", type=parse_moment, help="Начало интервала (ISO 8601, включительно)")
+        parser.add_argument("--until", type=parse_moment, help="Конец интервала (ISO 8601, не включительно)")
+
+    def handle(self, *args, **options):
+        owner_id = None
+        if options["owner"]:
+            owner_id = get_user_model().objects.filter(email=options["owner"]).values_list("id", flat=True).first()
+            if owner_id is None:
+                raise CommandError(f'Пользователь "{options["owner"]}" не найден.')
+
+        attempts = filter_attempts(
+            mailing_id=options["mailing"],
+            owner_id=owner_id,
+            status=options["status"],
+            since=options["since"],
+            until=options["until"],
+        )
+        lines = export_lines(attempts, options["format"])
+
+        if not options["output"]:
+            if options["gzip"]:
+                raise CommandError("Для --gzip нужен --output.")
+            sys.stdout.writelines(lines)
+            return
+
+        opener = gzip.open if options["gzip"] else open
+        with opener(options["output"], "wt", encoding="utf-8", newline="") as stream:
+            stream.writelines(lines)
+        self.stdout.write(self.style.SUCCESS(f"Выгрузка записана в {options['output']}"))
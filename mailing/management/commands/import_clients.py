@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from mailing.importers import import_clients
+from mailing.models import Mailing
+
+
+class Command(BaseCommand):
+    help = "Импортирует клиентов из CSV-файла (колонки email, full_name, comment)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=str, help="Путь к CSV-файлу")
+        parser.add_argument("--owner", required=True, help="Email владельца клиентов")
+        parser.add_argument("--mailing", type=int, help="ID рассылки для добавления клиентов")
+        parser.add_argument("--chunk-size", type=int, help="Размер пачки вставки")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        try:
+            owner = User.objects.get(email=options["owner"])
+        except User.DoesNotExist:
+            raise CommandError(f'Пользователь "{options["owner"]}" не найден.')
+
+        mailing = None
+        if options["mailing"]:
+            try:
+                mailing = Mailing.objects.get(id=options["mailing"], owner=owner)
+            except Mailing.DoesNotExist:
+                raise CommandError(f"Рассылка ID {options['mailing']} владельца не найдена.")
+
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as stream:
+                result = import_clients(stream, owner, mailing, options["chunk_size"])
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Ошибка импорта: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Импорт завершён. {result}"))
+        if mailing is not None:
+            self.stdout.write(f"В рассылку ID {mailing.id} добавлено клиентов: {result.attached}")
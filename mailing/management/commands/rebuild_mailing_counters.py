@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from mailing.models import Mailing
+from mailing.services import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счётчики попыток рассылок по статистике и таблице попыток"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "mailing_ids", nargs="*", type=int, help="ID рассылок (по умолчанию все)"
+        )
+
+    def handle(self, *args, **options):
+        mailings = Mailing.objects.all()
+        if options["mailing_ids"]:
+            mailings = mailings.filter(id__in=options["mailing_ids"])
+
+        updated = rebuild_counters(mailings)
+        self.stdout.write(self.style.SUCCESS(f"Счётчики пересчитаны для {updated} рассылок."))
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from mailing.seeding import seed
+
+
+class Command(BaseCommand):
+    help = "Заполняет базу синтетическими пользователями, клиентами, сообщениями и рассылками"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10, help="Количество пользователей")
+        parser.add_argument("--clients", type=int, default=1000, help="Клиентов на пользователя")
+        parser.add_argument("--messages", type=int, default=10, help="Сообщений на пользователя")
+        parser.add_argument("--mailings", type=int, default=20, help="Рассылок на пользователя")
+        parser.add_argument(
+            "--recipients", type=int, default=200, help="Среднее число получателей рассылки"
+        )
+        parser.add_argument(
+            "--attempts", type=int, default=20, help="Попыток в истории каждой отправленной рассылки"
+        )
+        parser.add_argument("--seed", type=int, help="Зерно генератора случайных чисел")
+        parser.add_argument(
+            "--force", action="store_true", help="Разрешить запуск при DEBUG=False"
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options["force"]:
+            raise CommandError(
+                "Команда предназначена для разработки и бенчмарков. "
+                "При DEBUG=False запустите её с --force."
+            )
+        result = seed(
+            users=options["users"],
+            clients_per_user=options["clients"],
+            messages_per_user=options["messages"],
+            mailings_per_user=options["mailings"],
+            recipients_per_mailing=options["recipients"],
+            attempts_per_mailing=options["attempts"],
+            random_seed=options["seed"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Данные созданы. {result}"))
@@ -1,19 +1,27 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 
-from mailing.models import Mailing
-from mailing.services import send_mailing
+from mailing.services import (
+    DELIVERY_ENGINES,
+    claim_mailing,
+    due_mailings,
+    release_mailing,
+    send_mailing,
+)
 
 
 class Command(BaseCommand):
     help = "Отправляет активные рассылки, время которых наступило"
 
-    def handle(self, *args, **options):
-        now = timezone.now()
-        mailings_to_send = Mailing.objects.filter(
-            status="running", first_send_time__lte=now, end_time__gte=now
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--engine",
+            choices=list(DELIVERY_ENGINES),
+            help="Движок отправки (по умолчанию MAILING_DELIVERY_ENGINE)",
         )
 
+    def handle(self, *args, **options):
+        mailings_to_send = due_mailings()
+
         if not mailings_to_send.exists():
             self.stdout.write(self.style.WARNING("Нет активных рассылок для отправки."))
             return
@@ -21,16 +29,27 @@ class Command(BaseCommand):
         self.stdout.write(f"Найдено рассылок для отправки: {mailings_to_send.count()}")
 
         for mailing in mailings_to_send:
+            claim = claim_mailing(mailing.id)
+            if claim is None:
+                self.stdout.write(
+                    self.style.WARNING(f"Рассылка ID {mailing.id} уже обрабатывается.")
+                )
+                continue
+
             self.stdout.write(f"Отправка рассылки ID: {mailing.id}")
-            success = send_mailing(mailing.id)
+
+            if mailing.status == "created":
+                mailing.status = "running"
+                mailing.save(update_fields=["status"])
+
+            try:
+                success = send_mailing(mailing.id, options["engine"], claim)
+            finally:
+                release_mailing(mailing.id, claim)
             if success:
                 self.stdout.write(
                     self.style.SUCCESS(f"Рассылка ID {mailing.id} отправлена.")
                 )
-
-                if mailing.status == "created":
-                    mailing.status = "running"
-                    mailing.save()
             else:
                 self.stdout.write(
                     self.style.ERROR(f"Ошибка при отправке рассылки ID {mailing.id}.")
@@ -0,0 +1,266 @@
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм длительностей, с
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HOSTNAME = socket.gethostname()
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Registry:
+    """
+    Метрики процесса: счётчики и гистограммы в памяти.
+
+    Наблюдение — несколько операций со словарём под блокировкой, без
+    обращений к базе или кешу. Раз в MAILING_METRICS_FLUSH_INTERVAL секунд
+    (и при выходе процесса) накопленные значения атомарно записываются
+    в собственный JSON-файл процесса в MAILING_METRICS_DIR. Эндпоинт метрик
+    суммирует файлы всех процессов: веб-сервера, воркеров и Celery Beat.
+    Файлы завершившихся процессов при сборе переносятся в значения
+    собирающего процесса и удаляются.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Отбрасывает несохранённые значения процесса и начинает новый файл.
+        """
+        self._values = {}
+        self._flushed_at = time.monotonic()
+        self._file_id = f"{HOSTNAME}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    def after_fork(self):
+        # Дочерний процесс (воркер prefork) начинает со своих нулевых значений
+        self._lock = threading.Lock()
+        self.reset()
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def update(self, name, labels, update):
+        key = (name, labels)
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = self.metrics[name].empty()
+            update(values)
+        if time.monotonic() - self._flushed_at >= settings.MAILING_METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                [name, dict(labels), list(values)] for (name, labels), values in self._values.items()
+            ]
+
+    def flush(self):
+        """
+        Записывает значения процесса в его файл (через переименование,
+        чтобы читатель не увидел недописанный файл).
+        """
+        self._flushed_at = time.monotonic()
+        samples = self.snapshot()
+        if not samples:
+            return
+        directory = Path(settings.MAILING_METRICS_DIR)
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            path = directory / f"{self._file_id}.json"
+            temporary = path.with_suffix(".tmp")
+            temporary.write_text(json.dumps(samples))
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить метрики: {e}")
+
+    def absorb_dead_files(self, directory):
+        """
+        Переносит значения завершившихся процессов этого хоста в значения
+        текущего процесса и удаляет их файлы, чтобы каталог не рос с каждым
+        перезапуском воркера. Файл сначала переименовывается: если метрики
+        собирают несколько процессов сразу, его заберёт только один.
+        """
+        absorbed = False
+        for path in directory.glob("*.json"):
+            host, _, pid = path.stem.rsplit("-", 1)[0].rpartition("-")
+            if host != HOSTNAME or not pid.isdigit() or process_alive(int(pid)):
+                continue
+            claimed = path.with_suffix(f".{self._file_id}")
+            try:
+                os.rename(path, claimed)
+                samples = json.loads(claimed.read_text())
+                claimed.unlink()
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError) as e:
+                logger.warning(f"Не удалось перенести метрики из {path.name}: {e}")
+                continue
+            with self._lock:
+                for name, labels, values in samples:
+                    if name not in self.metrics:
+                        continue
+                    key = (name, tuple(sorted(labels.items())))
+                    current = self._values.setdefault(key, self.metrics[name].empty())
+                    if len(current) == len(values):
+                        for index, value in enumerate(values):
+                            current[index] += value
+            absorbed = True
+        return absorbed
+
+    def collect(self):
+        """
+        Сумма значений всех процессов: {(имя, метки): значения}.
+        """
+        directory = Path(settings.MAILING_METRICS_DIR)
+        self.absorb_dead_files(directory)
+        self.flush()
+        totals = {}
+        for path in directory.glob("*.json"):
+            try:
+                samples = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            for name, labels, values in samples:
+                if name not in self.metrics:
+                    continue
+                key = (name, tuple(sorted(labels.items())))
+                current = totals.setdefault(key, [0] * len(values))
+                for index, value in enumerate(values):
+                    current[index] += value
+        return totals
+
+    def render(self):
+        """
+        Метрики всех процессов в текстовом формате Prometheus.
+        """
+        totals = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for (sample_name, labels), values in sorted(totals.items()):
+                if sample_name == name:
+                    lines.extend(metric.render(labels, values))
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{value}"' for key, value in labels)
+    return f"{{{pairs}}}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    @staticmethod
+    def empty():
+        return [0]
+
+    def inc(self, amount=1, **labels):
+        def update(values):
+            values[0] += amount
+
+        self.registry.update(self.name, tuple(sorted(labels.items())), update)
+
+    def render(self, labels, values):
+        return [f"{self.name}{format_labels(labels)} {values[0]}"]
+
+
+class Histogram:
+    """
+    Гистограмма: значения — счётчики корзин, затем сумма и количество.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS, registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.registry = registry or REGISTRY
+        self.registry.register(self)
+
+    def empty(self):
+        return [0] * (len(self.buckets) + 3)
+
+    def observe(self, value, **labels):
+        index = bisect_left(self.buckets, value)
+
+        def update(values):
+            values[index] += 1
+            values[-2] += value
+            values[-1] += 1
+
+        self.registry.update(self.name, tuple(sorted(labels.items())), update)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self, labels, values):
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, "+Inf"), values):
+            cumulative += count
+            bucket_labels = (*labels, ("le", bound))
+            lines.append(f"{self.name}_bucket{format_labels(bucket_labels)} {cumulative}")
+        lines.append(f"{self.name}_sum{format_labels(labels)} {values[-2]}")
+        lines.append(f"{self.name}_count{format_labels(labels)} {values[-1]}")
+        return lines
+
+
+REGISTRY = Registry()
+os.register_at_fork(after_in_child=REGISTRY.after_fork)
+atexit.register(REGISTRY.flush)
+
+SEND_SECONDS = Histogram("mailing_send_seconds", "Длительность отправки рассылки целиком")
+SEND_PHASE_SECONDS = Histogram(
+    "mailing_send_phase_seconds",
+    "Длительность этапов отправки пачки: чтение получателей, сборка писем, SMTP, запись попыток",
+)
+EMAILS_TOTAL = Counter("mailing_emails_total", "Отправленные письма по результату")
+SCHEDULER_TICK_SECONDS = Histogram(
+    "mailing_scheduler_tick_seconds", "Длительность тика планировщика send_scheduled_mailings"
+)
+SCHEDULER_MAILINGS_TOTAL = Counter(
+    "mailing_scheduler_mailings_total", "Рассылки, запущенные планировщиком"
+)
+VIEW_SECONDS = Histogram("mailing_view_seconds", "Длительность обработки страниц приложения mailing")
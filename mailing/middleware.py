@@ -0,0 +1,21 @@
+import time
+
+from .metrics import VIEW_SECONDS
+
+
+class ViewMetricsMiddleware:
+    """
+    Замеряет длительность обработки запросов к страницам приложения mailing
+    и пишет её в гистограмму mailing_view_seconds с меткой имени URL.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        match = request.resolver_match
+        if match is not None and match.app_name == "mailing":
+            VIEW_SECONDS.observe(time.perf_counter() - started, view=match.url_name)
+        return response
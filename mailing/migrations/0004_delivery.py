@@ -0,0 +1,73 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0003_alter_mailingattempt_options"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Delivery",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[("delivered", "Доставлено"), ("failed", "Ошибка")],
+                        max_length=10,
+                        verbose_name="Состояние",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="Дата и время изменения"
+                    ),
+                ),
+                (
+                    "client",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="mailing.client",
+                        verbose_name="Клиент",
+                    ),
+                ),
+                (
+                    "mailing",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="mailing.mailing",
+                        verbose_name="Рассылка",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Доставка",
+                "verbose_name_plural": "Доставки",
+                "indexes": [
+                    models.Index(
+                        fields=["mailing", "state"], name="delivery_mailing_state_idx"
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("mailing", "client"),
+                        name="unique_delivery_mailing_client",
+                    )
+                ],
+            },
+        ),
+    ]
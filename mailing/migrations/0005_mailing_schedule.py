@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:31
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_next_run_at(apps, schema_editor):
+    Mailing = apps.get_model("mailing", "Mailing")
+    Mailing.objects.exclude(status="completed").update(next_run_at=F("first_send_time"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0004_delivery"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailing",
+            name="last_sent_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Дата и время последней отправки"
+            ),
+        ),
+        migrations.AddField(
+            model_name="mailing",
+            name="next_run_at",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                null=True,
+                verbose_name="Дата и время следующей отправки",
+            ),
+        ),
+        migrations.AddField(
+            model_name="mailing",
+            name="periodicity",
+            field=models.CharField(
+                choices=[
+                    ("once", "Однократно"),
+                    ("daily", "Ежедневно"),
+                    ("weekly", "Еженедельно"),
+                    ("monthly", "Ежемесячно"),
+                ],
+                default="once",
+                max_length=10,
+                verbose_name="Периодичность",
+            ),
+        ),
+        migrations.RunPython(fill_next_run_at, migrations.RunPython.noop),
+    ]
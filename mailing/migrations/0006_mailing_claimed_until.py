@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0005_mailing_schedule"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailing",
+            name="claimed_until",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Обрабатывается воркером до"
+            ),
+        ),
+    ]
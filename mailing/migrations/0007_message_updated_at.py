@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0006_mailing_claimed_until"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                default=django.utils.timezone.now,
+                verbose_name="Дата и время изменения",
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:35
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Mailing = apps.get_model("mailing", "Mailing")
+    MailingAttempt = apps.get_model("mailing", "MailingAttempt")
+
+    def count(**filters):
+        attempts = (
+            MailingAttempt.objects.filter(mailing=OuterRef("pk"), **filters)
+            .values("mailing")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        return Coalesce(Subquery(attempts, output_field=IntegerField()), Value(0))
+
+    Mailing.objects.update(
+        total_attempts=count(),
+        successful_attempts=count(status="success"),
+        failed_attempts=count(status="failed"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0007_message_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailing",
+            name="failed_attempts",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Неуспешных попыток"
+            ),
+        ),
+        migrations.AddField(
+            model_name="mailing",
+            name="successful_attempts",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Успешных попыток"
+            ),
+        ),
+        migrations.AddField(
+            model_name="mailing",
+            name="total_attempts",
+            field=models.PositiveIntegerField(default=0, verbose_name="Всего попыток"),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,112 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0008_mailing_attempt_counters"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        max_length=50, unique=True, verbose_name="Название"
+                    ),
+                ),
+                (
+                    "last_attempt_id",
+                    models.BigIntegerField(
+                        default=0, verbose_name="ID последней учтённой попытки"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Отметка агрегации",
+                "verbose_name_plural": "Отметки агрегации",
+            },
+        ),
+        migrations.CreateModel(
+            name="DeliveryRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("hour", "Час"), ("day", "День")],
+                        max_length=4,
+                        verbose_name="Период",
+                    ),
+                ),
+                ("bucket_start", models.DateTimeField(verbose_name="Начало периода")),
+                (
+                    "successful",
+                    models.PositiveIntegerField(default=0, verbose_name="Успешных"),
+                ),
+                (
+                    "failed",
+                    models.PositiveIntegerField(default=0, verbose_name="Неуспешных"),
+                ),
+                (
+                    "mailing",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="mailing.mailing",
+                        verbose_name="Рассылка",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Владелец",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Статистика за период",
+                "verbose_name_plural": "Статистика за периоды",
+                "indexes": [
+                    models.Index(
+                        fields=["owner", "period", "bucket_start"],
+                        name="rollup_owner_period_idx",
+                    ),
+                    models.Index(
+                        fields=["period", "bucket_start"], name="rollup_period_idx"
+                    ),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("period", "mailing", "bucket_start"),
+                        name="unique_rollup_bucket",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0009_delivery_rollups"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Сначала новые индексы, затем удаление перекрытых ими одиночных
+        migrations.AddIndex(
+            model_name="mailing",
+            index=models.Index(
+                condition=models.Q(("status", "completed"), _negated=True),
+                fields=["next_run_at"],
+                name="mailing_due_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mailingattempt",
+            index=models.Index(
+                fields=["mailing", "attempt_time"], name="attempt_mailing_time_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mailingattempt",
+            index=models.Index(
+                fields=["mailing", "status", "attempt_time"],
+                name="attempt_mailing_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mailingattempt",
+            index=models.Index(fields=["attempt_time", "id"], name="attempt_time_idx"),
+        ),
+        migrations.AlterField(
+            model_name="mailing",
+            name="next_run_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Дата и время следующей отправки"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="mailingattempt",
+            name="mailing",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="mailing.mailing",
+                verbose_name="Рассылка",
+            ),
+        ),
+    ]
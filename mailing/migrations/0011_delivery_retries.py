@@ -0,0 +1,46 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0010_scheduler_and_attempt_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="delivery",
+            name="next_retry_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="Дата и время следующего повтора"
+            ),
+        ),
+        migrations.AddField(
+            model_name="delivery",
+            name="retries",
+            field=models.PositiveSmallIntegerField(default=0, verbose_name="Повторов"),
+        ),
+        migrations.AlterField(
+            model_name="delivery",
+            name="state",
+            field=models.CharField(
+                choices=[
+                    ("delivered", "Доставлено"),
+                    ("retrying", "Ожидает повтора"),
+                    ("failed", "Ошибка"),
+                ],
+                max_length=10,
+                verbose_name="Состояние",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="delivery",
+            index=models.Index(
+                condition=models.Q(("state", "retrying")),
+                fields=["next_retry_at"],
+                name="delivery_retry_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0011_delivery_retries"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="mailingattempt",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("success", "Успешно"),
+                    ("failed", "Не успешно"),
+                    ("suppressed", "Подавлено"),
+                ],
+                max_length=10,
+                verbose_name="Статус",
+            ),
+        ),
+        migrations.CreateModel(
+            name="Suppression",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("email", models.EmailField(max_length=254, verbose_name="Email")),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("bounce", "Отказ сервера"),
+                            ("complaint", "Жалоба"),
+                            ("unsubscribe", "Отписка"),
+                            ("manual", "Вручную"),
+                        ],
+                        default="manual",
+                        max_length=20,
+                        verbose_name="Причина",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата и время добавления"
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Владелец",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Подавленный адрес",
+                "verbose_name_plural": "Подавленные адреса",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("email", "owner"), name="unique_suppression_owner"
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("owner__isnull", True)),
+                        fields=("email",),
+                        name="unique_suppression_global",
+                    ),
+                ],
+            },
+        ),
+    ]
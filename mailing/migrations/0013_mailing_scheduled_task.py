@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0012_suppression"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailing",
+            name="scheduled_task_id",
+            field=models.CharField(
+                blank=True, default="", max_length=36, verbose_name="Задача запуска"
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:09
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_runs(apps, schema_editor):
+    """
+    Отправлявшиеся рассылки получают номер запуска 1. Доставки текущего
+    (незавершённого) запуска — изменённые после last_sent_at — относятся
+    к нему, остальные — к прошлым запускам с номером 0.
+    """
+    Mailing = apps.get_model("mailing", "Mailing")
+    Delivery = apps.get_model("mailing", "Delivery")
+
+    Mailing.objects.filter(last_sent_at__isnull=False).update(run_number=1)
+    Delivery.objects.filter(
+        mailing__last_sent_at__isnull=False, updated_at__gt=F("mailing__last_sent_at")
+    ).update(run=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0014_client_email_lower_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="delivery",
+            name="run",
+            field=models.PositiveIntegerField(default=0, verbose_name="Номер запуска"),
+        ),
+        migrations.AddField(
+            model_name="mailing",
+            name="run_number",
+            field=models.PositiveIntegerField(default=0, verbose_name="Номер запуска"),
+        ),
+        migrations.RunPython(fill_runs, migrations.RunPython.noop),
+    ]
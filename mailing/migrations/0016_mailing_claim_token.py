@@ -0,0 +1,20 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mailing", "0015_delivery_run"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailing",
+            name="claim_token",
+            field=models.CharField(
+                blank=True, default="", max_length=32, verbose_name="Токен захвата"
+            ),
+        ),
+    ]
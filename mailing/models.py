@@ -1,5 +1,9 @@
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
 from django.conf import settings
 from django.db import models
+from django.db.models.functions import Lower
 
 
 class Client(models.Model):
@@ -19,6 +23,10 @@ class Client(models.Model):
         permissions = [
             ("view_client_list", "Can view client list"),
         ]
+        indexes = [
+            # Импорт: поиск существующих адресов без учёта регистра
+            models.Index(Lower("email"), name="client_email_lower_idx"),
+        ]
 
 
 class Message(models.Model):
@@ -27,6 +35,7 @@ class Message(models.Model):
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="Владелец"
     )  # Владелец
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата и время изменения")
 
     def __str__(self):
         return self.subject
@@ -45,6 +54,18 @@ class Mailing(models.Model):
         ("running", "Запущена"),
         ("completed", "Завершена"),
     ]
+    PERIODICITY_CHOICES = [
+        ("once", "Однократно"),
+        ("daily", "Ежедневно"),
+        ("weekly", "Еженедельно"),
+        ("monthly", "Ежемесячно"),
+    ]
+    # Шаг расписания и его оценка снизу в виде timedelta для быстрого пропуска периодов
+    PERIODS = {
+        "daily": (relativedelta(days=1), timedelta(days=1)),
+        "weekly": (relativedelta(weeks=1), timedelta(weeks=1)),
+        "monthly": (relativedelta(months=1), timedelta(days=31)),
+    }
 
     first_send_time = models.DateTimeField(verbose_name="Дата и время первой отправки")
     end_time = models.DateTimeField(verbose_name="Дата и время окончания отправки")
@@ -58,10 +79,82 @@ class Mailing(models.Model):
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="Владелец"
     )  # Владелец
+    periodicity = models.CharField(
+        max_length=10,
+        choices=PERIODICITY_CHOICES,
+        default="once",
+        verbose_name="Периодичность",
+    )
+    last_sent_at = models.DateTimeField(
+        blank=True, null=True, verbose_name="Дата и время последней отправки"
+    )
+    next_run_at = models.DateTimeField(
+        blank=True, null=True, verbose_name="Дата и время следующей отправки"
+    )
+    claimed_until = models.DateTimeField(
+        blank=True, null=True, verbose_name="Обрабатывается воркером до"
+    )
+    # Токен текущего захвата: продлить и снять аренду может только её владелец
+    claim_token = models.CharField(
+        max_length=32, blank=True, default="", verbose_name="Токен захвата"
+    )
+    # Задача Celery, поставленная на next_run_at (ETA); пусто — задачи нет
+    scheduled_task_id = models.CharField(
+        max_length=36, blank=True, default="", verbose_name="Задача запуска"
+    )
+    # Номер текущего запуска: увеличивается при завершении запуска,
+    # доставки (Delivery) хранят номер запуска, к которому относятся
+    run_number = models.PositiveIntegerField(default=0, verbose_name="Номер запуска")
+    # Счётчики попыток: обновляются F()-выражениями при записи попыток,
+    # пересчитываются командой rebuild_mailing_counters
+    total_attempts = models.PositiveIntegerField(default=0, verbose_name="Всего попыток")
+    successful_attempts = models.PositiveIntegerField(default=0, verbose_name="Успешных попыток")
+    failed_attempts = models.PositiveIntegerField(default=0, verbose_name="Неуспешных попыток")
+
+    COUNTER_FIELDS = ("total_attempts", "successful_attempts", "failed_attempts")
 
     def __str__(self):
         return f"Рассылка {self.pk}: {self.message.subject}"
 
+    def compute_next_run(self):
+        """
+        Вычисляет время следующего запуска по расписанию.
+        None — запусков больше не будет.
+        """
+        if self.status == "completed":
+            return None
+        if self.last_sent_at is None:
+            return self.first_send_time
+        if self.periodicity == "once":
+            return None
+
+        step, min_step = self.PERIODS[self.periodicity]
+        periods = max((self.last_sent_at - self.first_send_time) // min_step, 0) + 1
+        while self.first_send_time + step * periods <= self.last_sent_at:
+            periods += 1
+        next_run = self.first_send_time + step * periods
+        return next_run if next_run <= self.end_time else None
+
+    def save(self, *args, **kwargs):
+        self.next_run_at = self.compute_next_run()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None and not self._state.adding:
+            # Счётчики меняются только через F(), задача запуска — только
+            # schedule_mailing, номер запуска — только complete_run, токен
+            # захвата — только claim_mailing: не затираем их устаревшими значениями
+            update_fields = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name
+                not in (*self.COUNTER_FIELDS, "scheduled_task_id", "run_number", "claim_token")
+            ]
+        if update_fields is not None and "next_run_at" not in update_fields:
+            update_fields = [*update_fields, "next_run_at"]
+        if update_fields is not None:
+            kwargs["update_fields"] = update_fields
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Рассылка"
         verbose_name_plural = "Рассылки"
@@ -69,12 +162,21 @@ class Mailing(models.Model):
             ("set_mailing_status", "Can disable mailing"),
             ("view_mailing_list", "Can view mailing list"),
         ]
+        indexes = [
+            # Планировщик: due_mailings() ищет незавершённые рассылки по next_run_at
+            models.Index(
+                fields=["next_run_at"],
+                name="mailing_due_idx",
+                condition=~models.Q(status="completed"),
+            ),
+        ]
 
 
 class MailingAttempt(models.Model):
     STATUS_CHOICES = [
         ("success", "Успешно"),
         ("failed", "Не успешно"),
+        ("suppressed", "Подавлено"),
     ]
 
     attempt_time = models.DateTimeField(
@@ -86,12 +188,13 @@ class MailingAttempt(models.Model):
     server_response = models.TextField(
         blank=True, null=True, verbose_name="Ответ почтового сервера"
     )
+    # Отдельный индекс по mailing не нужен: его покрывают составные индексы ниже
     mailing = models.ForeignKey(
-        Mailing, on_delete=models.CASCADE, verbose_name="Рассылка"
+        Mailing, on_delete=models.CASCADE, db_index=False, verbose_name="Рассылка"
     )
 
     def __str__(self):
-        return f"Попытка {self.pk} для рассылки {self.mailing.pk} - {self.status}"
+        return f"Попытка {self.pk} для рассылки {self.mailing_id} - {self.status}"
 
     class Meta:
         verbose_name = "Рассылка"
@@ -100,3 +203,178 @@ class MailingAttempt(models.Model):
             ("set_mailing_status", "Can disable mailing"),
             ("view_mailing_list", "Can view mailing list"),
         ]
+        indexes = [
+            # Попытки рассылки по времени (список, выгрузка)
+            models.Index(fields=["mailing", "attempt_time"], name="attempt_mailing_time_idx"),
+            # Счётчики и выгрузка по рассылке и статусу
+            models.Index(
+                fields=["mailing", "status", "attempt_time"], name="attempt_mailing_status_idx"
+            ),
+            # Общий список попыток с сортировкой по времени, выгрузка за период
+            models.Index(fields=["attempt_time", "id"], name="attempt_time_idx"),
+        ]
+
+
+class Delivery(models.Model):
+    """
+    Состояние доставки рассылки конкретному клиенту.
+    Позволяет продолжить прерванную отправку без повторных писем.
+    """
+
+    STATE_CHOICES = [
+        ("delivered", "Доставлено"),
+        ("retrying", "Ожидает повтора"),
+        ("failed", "Ошибка"),
+    ]
+
+    mailing = models.ForeignKey(
+        Mailing, on_delete=models.CASCADE, verbose_name="Рассылка"
+    )
+    client = models.ForeignKey(
+        Client, on_delete=models.CASCADE, verbose_name="Клиент"
+    )
+    state = models.CharField(
+        max_length=10, choices=STATE_CHOICES, verbose_name="Состояние"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата и время изменения")
+    # Mailing.run_number запуска, в котором получатель обработан. Повтор,
+    # завершившийся после окончания запуска, сохраняет номер своего запуска
+    run = models.PositiveIntegerField(default=0, verbose_name="Номер запуска")
+    # Повторы после временных ошибок: сколько уже было и когда следующий
+    retries = models.PositiveSmallIntegerField(default=0, verbose_name="Повторов")
+    next_retry_at = models.DateTimeField(
+        blank=True, null=True, verbose_name="Дата и время следующего повтора"
+    )
+
+    def __str__(self):
+        return f"Рассылка {self.mailing_id} -> клиент {self.client_id}: {self.state}"
+
+    class Meta:
+        verbose_name = "Доставка"
+        verbose_name_plural = "Доставки"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["mailing", "client"], name="unique_delivery_mailing_client"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["mailing", "state"], name="delivery_mailing_state_idx"),
+            # Поиск просроченных повторов
+            models.Index(
+                fields=["next_retry_at"],
+                name="delivery_retry_idx",
+                condition=models.Q(state="retrying"),
+            ),
+        ]
+
+
+class DeliveryRollup(models.Model):
+    """
+    Количество попыток отправки рассылки за час или за день.
+    Заполняется инкрементально задачей rollup_attempts.
+    """
+
+    PERIOD_CHOICES = [
+        ("hour", "Час"),
+        ("day", "День"),
+    ]
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES, verbose_name="Период")
+    bucket_start = models.DateTimeField(verbose_name="Начало периода")
+    mailing = models.ForeignKey(
+        Mailing, on_delete=models.CASCADE, verbose_name="Рассылка"
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name="Владелец"
+    )
+    successful = models.PositiveIntegerField(default=0, verbose_name="Успешных")
+    failed = models.PositiveIntegerField(default=0, verbose_name="Неуспешных")
+
+    def __str__(self):
+        return f"Рассылка {self.mailing_id}, {self.period} {self.bucket_start}"
+
+    class Meta:
+        verbose_name = "Статистика за период"
+        verbose_name_plural = "Статистика за периоды"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period", "mailing", "bucket_start"], name="unique_rollup_bucket"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["owner", "period", "bucket_start"], name="rollup_owner_period_idx"),
+            models.Index(fields=["period", "bucket_start"], name="rollup_period_idx"),
+        ]
+
+
+class RollupCheckpoint(models.Model):
+    """
+    Верхняя граница (ID попытки), до которой попытки уже учтены в статистике.
+    """
+
+    name = models.CharField(max_length=50, unique=True, verbose_name="Название")
+    last_attempt_id = models.BigIntegerField(default=0, verbose_name="ID последней учтённой попытки")
+
+    def __str__(self):
+        return f"{self.name}: {self.last_attempt_id}"
+
+    class Meta:
+        verbose_name = "Отметка агрегации"
+        verbose_name_plural = "Отметки агрегации"
+
+
+class Suppression(models.Model):
+    """
+    Адрес, на который рассылки не отправляются: после жёсткого отказа,
+    жалобы или отписки. Без владельца — для всех рассылок, с владельцем —
+    только для его рассылок.
+    """
+
+    REASON_CHOICES = [
+        ("bounce", "Отказ сервера"),
+        ("complaint", "Жалоба"),
+        ("unsubscribe", "Отписка"),
+        ("manual", "Вручную"),
+    ]
+
+    email = models.EmailField(verbose_name="Email")
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        verbose_name="Владелец",
+    )
+    reason = models.CharField(
+        max_length=20, choices=REASON_CHOICES, default="manual", verbose_name="Причина"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата и время добавления")
+
+    def __str__(self):
+        scope = f"владелец {self.owner_id}" if self.owner_id else "все рассылки"
+        return f"{self.email} ({self.get_reason_display()}, {scope})"
+
+    def normalize_email(self):
+        self.email = (self.email or "").strip().lower()
+
+    def clean(self):
+        # До проверки ограничений уникальности: иначе A@x.com при
+        # существующем a@x.com пройдёт валидацию формы и упадёт в базе
+        super().clean()
+        self.normalize_email()
+
+    def save(self, *args, **kwargs):
+        self.normalize_email()
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = "Подавленный адрес"
+        verbose_name_plural = "Подавленные адреса"
+        constraints = [
+            models.UniqueConstraint(fields=["email", "owner"], name="unique_suppression_owner"),
+            models.UniqueConstraint(
+                fields=["email"],
+                condition=models.Q(owner__isnull=True),
+                name="unique_suppression_global",
+            ),
+        ]
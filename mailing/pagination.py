@@ -0,0 +1,119 @@
+import base64
+import json
+from datetime import date, datetime
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    """
+    Страница keyset-пагинации: объекты и курсоры соседних страниц.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginationMixin:
+    """
+    Keyset (seek) пагинация для ListView вместо OFFSET.
+
+    Страница выбирается условием по ключу сортировки keyset_ordering
+    (последнее поле должно быть уникальным, например id), поэтому время
+    ответа не зависит от номера страницы и размера таблицы. Курсоры
+    передаются в URL параметрами ?after=... и ?before=....
+    """
+
+    paginate_by = 50
+    keyset_ordering = ("id",)
+
+    def paginate_queryset(self, queryset, page_size):
+        after = self.decode_cursor(queryset.model, self.request.GET.get("after"))
+        before = self.decode_cursor(queryset.model, self.request.GET.get("before"))
+        backwards = before is not None and after is None
+
+        ordering = [self.reverse(field) for field in self.keyset_ordering] if backwards else self.keyset_ordering
+        queryset = queryset.order_by(*ordering)
+        cursor = before if backwards else after
+        if cursor is not None:
+            queryset = queryset.filter(self.seek_condition(ordering, cursor))
+
+        object_list = list(queryset[: page_size + 1])
+        has_more = len(object_list) > page_size
+        object_list = object_list[:page_size]
+
+        if backwards:
+            object_list.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+
+        page = KeysetPage(
+            object_list,
+            next_cursor=self.encode_cursor(object_list[-1]) if has_next and object_list else None,
+            previous_cursor=self.encode_cursor(object_list[0]) if has_previous and object_list else None,
+        )
+        return None, page, object_list, page.has_next or page.has_previous
+
+    @staticmethod
+    def reverse(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    @staticmethod
+    def seek_condition(ordering, values):
+        """
+        Условие «строго после курсора» для сортировки ordering:
+        (a > a0) OR (a = a0 AND b > b0) OR ...
+        """
+        conditions = []
+        for index, field in enumerate(ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            equal = {prev.lstrip("-"): values[prev.lstrip("-")] for prev in ordering[:index]}
+            conditions.append(Q(**equal, **{f"{name}__{lookup}": values[name]}))
+        return reduce(lambda left, right: left | right, conditions)
+
+    def encode_cursor(self, obj):
+        values = []
+        for field in self.keyset_ordering:
+            value = getattr(obj, field.lstrip("-"))
+            if isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            values.append(value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+    def decode_cursor(self, model, cursor):
+        """
+        Разбирает курсор из URL. Некорректный курсор означает первую страницу.
+        """
+        if not cursor:
+            return None
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            names = [field.lstrip("-") for field in self.keyset_ordering]
+            if not isinstance(raw, list) or len(raw) != len(names):
+                return None
+            return {
+                name: model._meta.get_field(name).to_python(value)
+                for name, value in zip(names, raw)
+            }
+        except (ValueError, TypeError, ValidationError):
+            return None
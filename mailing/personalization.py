@@ -0,0 +1,61 @@
+import re
+
+# Поля получателя, доступные в шаблонах: {{ full_name }}, {{ email }}
+PLACEHOLDER_FIELDS = ("full_name", "email")
+PLACEHOLDER_RE = re.compile(r"{{\s*(\w+)\s*}}")
+
+# Скомпилированные шаблоны сообщений: (id сообщения, хеш updated_at) -> шаблоны
+_compiled_messages = {}
+MAX_COMPILED_MESSAGES = 256
+
+
+class CompiledTemplate:
+    """
+    Шаблон темы или тела письма, разобранный один раз.
+
+    Плейсхолдеры {{ full_name }} и {{ email }} превращаются в строку формата
+    с полями {0.full_name}/{0.email}, поэтому подстановка для получателя —
+    один вызов str.format. Неизвестные плейсхолдеры остаются как есть.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.is_static = True
+        parts = []
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(source):
+            if match.group(1) not in PLACEHOLDER_FIELDS:
+                continue
+            parts.append(self._escape(source[position:match.start()]))
+            parts.append(f"{{0.{match.group(1)}}}")
+            position = match.end()
+            self.is_static = False
+        parts.append(self._escape(source[position:]))
+        self.format_string = "".join(parts)
+
+    @staticmethod
+    def _escape(text):
+        return text.replace("{", "{{").replace("}", "}}")
+
+    def render(self, recipient):
+        """
+        Подставляет поля получателя (объект с атрибутами full_name и email).
+        """
+        if self.is_static:
+            return self.source
+        return self.format_string.format(recipient)
+
+
+def compile_message(message):
+    """
+    Возвращает скомпилированные (тема, тело) сообщения.
+    Шаблоны кешируются по id сообщения и хешу времени его изменения.
+    """
+    key = (message.id, hash(message.updated_at))
+    compiled = _compiled_messages.get(key)
+    if compiled is None:
+        if len(_compiled_messages) >= MAX_COMPILED_MESSAGES:
+            _compiled_messages.clear()
+        compiled = (CompiledTemplate(message.subject), CompiledTemplate(message.body))
+        _compiled_messages[key] = compiled
+    return compiled
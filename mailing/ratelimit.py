@@ -0,0 +1,153 @@
+import logging
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Бэкенды кеша, в которых incr атомарен и общий для всех процессов
+ATOMIC_CACHE_BACKENDS = ("redis", "memcached")
+
+
+@lru_cache(maxsize=None)
+def check_cache_backend(backend):
+    """
+    Сообщает об ошибке, если кеш не подходит для общих вёдер токенов:
+    в файловом и других бэкендах incr — это чтение и запись без блокировки,
+    и параллельные воркеры теряют списания, превышая лимит.
+    """
+    if any(name in backend.lower() for name in ATOMIC_CACHE_BACKENDS):
+        return True
+    logger.error(
+        f"Кеш {backend} не поддерживает атомарный incr: лимиты скорости отправки "
+        f"не соблюдаются между процессами. Задайте CACHE_REDIS_URL."
+    )
+    return False
+
+
+class TokenBucket:
+    """
+    Ведро токенов, общее для всех процессов через кеш Django.
+
+    Лимит rate писем в минуту выдаётся мелкими порциями: каждое окно длиной
+    window секунд пополняет ведро на capacity токенов. Токены расходуются
+    атомарным cache.incr, поэтому ведро корректно делится между воркерами
+    Celery при общем бэкенде кеша (Redis, Memcached).
+    """
+
+    def __init__(self, name, rate):
+        self.name = name
+        self.rate = rate
+        self.capacity = max(rate // 60, 1)
+        self.window = 60.0 * self.capacity / rate
+
+    def key(self, now):
+        return f"ratelimit:{self.name}:{int(now // self.window)}"
+
+    def wait_time(self, now):
+        """
+        Сколько секунд ждать до следующего окна, если токены текущего окна
+        кончились, иначе 0. Токен не расходуется.
+        """
+        if cache.get(self.key(now), 0) < self.capacity:
+            return 0
+        return (int(now // self.window) + 1) * self.window - now
+
+    def try_acquire(self, now):
+        """
+        Берёт токен из текущего окна. Возвращает 0, если токен получен,
+        иначе — сколько секунд ждать до следующего окна.
+        """
+        window_number = int(now // self.window)
+        key = self.key(now)
+        cache.add(key, 0, timeout=int(self.window) + 60)
+        try:
+            used = cache.incr(key)
+        except ValueError:
+            # Ключ вытеснен из кеша между add и incr: окно начинается заново
+            cache.add(key, 1, timeout=int(self.window) + 60)
+            used = 1
+        if used <= self.capacity:
+            return 0
+        return (window_number + 1) * self.window - now
+
+    def release(self, now):
+        """
+        Возвращает токен, взятый try_acquire(now).
+        """
+        try:
+            cache.decr(self.key(now))
+        except ValueError:
+            pass
+
+    def acquire(self):
+        while wait := self.try_acquire(time.time()):
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """
+    Ограничение скорости отправки на почтовый релей и на домен получателя.
+
+    Перед каждым письмом берётся токен из ведра релея и из ведра домена
+    получателя; если токена нет, отправка ждёт, а не получает отказ релея.
+    Токены берутся только тогда, когда они есть в обоих вёдрах, чтобы
+    ожидание токена домена не тратило токен релея.
+    """
+
+    def __init__(self, relay, relay_rate=0, domain_rates=None, default_domain_rate=0):
+        self.relay_bucket = TokenBucket(f"relay:{relay}", relay_rate) if relay_rate else None
+        self.domain_rates = domain_rates or {}
+        self.default_domain_rate = default_domain_rate
+        self._domain_buckets = {}
+
+    @classmethod
+    def from_settings(cls, relay=None):
+        """
+        Создаёт ограничитель из настроек MAILING_RATE_LIMIT_*.
+        Возвращает None, если лимиты не заданы.
+        """
+        relay_rate = settings.MAILING_RATE_LIMIT_RELAY
+        domain_rates = settings.MAILING_RATE_LIMIT_DOMAINS
+        default_domain_rate = settings.MAILING_RATE_LIMIT_DEFAULT_DOMAIN
+        if not (relay_rate or domain_rates or default_domain_rate):
+            return None
+        check_cache_backend(settings.CACHES["default"]["BACKEND"])
+        return cls(relay or settings.EMAIL_HOST, relay_rate, domain_rates, default_domain_rate)
+
+    def domain_bucket(self, domain):
+        if domain not in self._domain_buckets:
+            rate = self.domain_rates.get(domain, self.default_domain_rate)
+            self._domain_buckets[domain] = TokenBucket(f"domain:{domain}", rate) if rate else None
+        return self._domain_buckets[domain]
+
+    def acquire(self, email):
+        """
+        Ждёт, пока отправка письма на email не уложится в лимиты.
+        """
+        domain = email.rpartition("@")[2].lower()
+        buckets = [bucket for bucket in (self.relay_bucket, self.domain_bucket(domain)) if bucket]
+        while wait := self.try_acquire(buckets, time.time()):
+            time.sleep(wait)
+
+    @staticmethod
+    def try_acquire(buckets, now):
+        """
+        Берёт по токену из каждого ведра. Возвращает 0, если все токены
+        получены, иначе — сколько секунд ждать; в этом случае уже взятые
+        токены возвращаются в вёдра.
+        """
+        wait = max((bucket.wait_time(now) for bucket in buckets), default=0)
+        if wait:
+            return wait
+        acquired = []
+        for bucket in buckets:
+            if wait := bucket.try_acquire(now):
+                # Другой процесс успел забрать токен после проверки
+                for spent in acquired:
+                    spent.release(now)
+                return wait
+            acquired.append(bucket)
+        return 0
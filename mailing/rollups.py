@@ -0,0 +1,129 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from .models import DeliveryRollup, MailingAttempt, RollupCheckpoint
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = "mailing_attempts"
+TRUNCATE = {
+    "hour": TruncHour,
+    "day": TruncDay,
+}
+
+
+def rollup_batch(batch_size):
+    """
+    Учитывает в статистике следующую пачку попыток после отметки.
+
+    Берутся попытки старше MAILING_ROLLUP_LAG секунд: к этому времени их
+    транзакции гарантированно зафиксированы, и отметка по ID ничего не
+    пропустит. Возвращает количество учтённых попыток.
+    """
+    with transaction.atomic():
+        checkpoint, _ = RollupCheckpoint.objects.select_for_update().get_or_create(
+            name=CHECKPOINT_NAME
+        )
+        settled_before = timezone.now() - timedelta(seconds=settings.MAILING_ROLLUP_LAG)
+        attempt_ids = list(
+            MailingAttempt.objects.filter(
+                id__gt=checkpoint.last_attempt_id, attempt_time__lt=settled_before
+            )
+            .order_by("id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if not attempt_ids:
+            return 0
+
+        attempts = MailingAttempt.objects.filter(
+            id__gt=checkpoint.last_attempt_id, id__lte=attempt_ids[-1]
+        )
+        for period, truncate in TRUNCATE.items():
+            buckets = (
+                attempts.annotate(bucket_start=truncate("attempt_time"))
+                .values("mailing_id", "mailing__owner_id", "bucket_start")
+                .annotate(
+                    successful=Count("id", filter=Q(status="success")),
+                    failed=Count("id", filter=Q(status="failed")),
+                )
+            )
+            merge_buckets(period, buckets)
+
+        checkpoint.last_attempt_id = attempt_ids[-1]
+        checkpoint.save(update_fields=["last_attempt_id"])
+    return len(attempt_ids)
+
+
+def merge_buckets(period, buckets):
+    """
+    Прибавляет агрегаты пачки к существующим строкам статистики.
+    """
+    buckets = list(buckets)
+    existing = {
+        (rollup.mailing_id, rollup.bucket_start): rollup
+        for rollup in DeliveryRollup.objects.filter(
+            period=period,
+            mailing_id__in={bucket["mailing_id"] for bucket in buckets},
+            bucket_start__in={bucket["bucket_start"] for bucket in buckets},
+        )
+    }
+
+    to_create = []
+    to_update = []
+    for bucket in buckets:
+        rollup = existing.get((bucket["mailing_id"], bucket["bucket_start"]))
+        if rollup is None:
+            to_create.append(
+                DeliveryRollup(
+                    period=period,
+                    bucket_start=bucket["bucket_start"],
+                    mailing_id=bucket["mailing_id"],
+                    owner_id=bucket["mailing__owner_id"],
+                    successful=bucket["successful"],
+                    failed=bucket["failed"],
+                )
+            )
+        else:
+            rollup.successful += bucket["successful"]
+            rollup.failed += bucket["failed"]
+            to_update.append(rollup)
+
+    DeliveryRollup.objects.bulk_create(to_create)
+    DeliveryRollup.objects.bulk_update(to_update, ["successful", "failed"])
+
+
+def rollup_attempts(batch_size=None):
+    """
+    Догоняет статистику по всем новым попыткам пачками по
+    MAILING_ROLLUP_BATCH_SIZE. Возвращает количество учтённых попыток.
+    """
+    batch_size = batch_size or settings.MAILING_ROLLUP_BATCH_SIZE
+    total = 0
+    while processed := rollup_batch(batch_size):
+        total += processed
+    if total:
+        logger.info(f"В статистику добавлено попыток: {total}")
+    return total
+
+
+def timeseries(period, since, owner=None, mailing_id=None):
+    """
+    Ряд успешных и неуспешных попыток по периодам начиная с since.
+    Читает только таблицу статистики. owner=None — по всем владельцам.
+    """
+    rollups = DeliveryRollup.objects.filter(period=period, bucket_start__gte=since)
+    if owner is not None:
+        rollups = rollups.filter(owner=owner)
+    if mailing_id is not None:
+        rollups = rollups.filter(mailing_id=mailing_id)
+    return list(
+        rollups.values("bucket_start")
+        .annotate(successful=Sum("successful"), failed=Sum("failed"))
+        .order_by("bucket_start")
+    )
@@ -0,0 +1,100 @@
+from collections import namedtuple
+from itertools import groupby, islice
+from operator import itemgetter
+
+from django.conf import settings
+from django.db.models import F, Q, Value
+from django.db.models.functions import Lower, StrIndex, Substr
+from django.db.models.lookups import Exact, GreaterThan, In, LessThan
+
+from .models import Mailing
+
+# Часть получателей рассылки: границы first и last — ключи (домен, client_id)
+# в порядке сортировки, exclude — домены внутри границ, выделенные в свои
+# части, size — число получателей при разбиении
+Partition = namedtuple("Partition", ["domain", "first", "last", "exclude", "size"])
+
+
+def email_domain(field="client__email"):
+    """
+    SQL-выражение домена адреса из поля field: часть после «@» в нижнем регистре.
+    """
+    return Lower(Substr(F(field), StrIndex(F(field), Value("@")) + 1))
+
+
+def domain_of(email):
+    return email.rpartition("@")[2].lower()
+
+
+def route_for(domain):
+    """
+    Параметры соединения для домена из MAILING_DOMAIN_ROUTES (host, port,
+    username, password, use_tls, backend и т. п.). Для доменов без
+    собственного маршрута — пустой словарь, то есть EMAIL_HOST.
+    """
+    if domain is None:
+        return {}
+    return dict(settings.MAILING_DOMAIN_ROUTES.get(domain, {}))
+
+
+def partition_recipients(mailing, chunk_size=None, min_size=None):
+    """
+    Потоково разбивает получателей рассылки на части по доменам адресов.
+
+    Строки таблицы связи сортируются в SQL по домену и client_id и читаются
+    одним проходом, в памяти — не больше одной пачки id. Выдаёт Partition
+    до chunk_size получателей: часть задаётся границами, а не списком id,
+    поэтому её размер не зависит от числа получателей, а задача части
+    выбирает их условием partition_condition. Домены, у которых меньше
+    min_size получателей и нет маршрута в MAILING_DOMAIN_ROUTES, собираются
+    в общие части с доменом None: им нечего выигрывать от отдельного
+    соединения, а задача на несколько писем дороже самих писем.
+    """
+    chunk_size = chunk_size or settings.MAILING_FANOUT_CHUNK_SIZE
+    min_size = min(min_size or settings.MAILING_DOMAIN_PARTITION_MIN_SIZE, chunk_size)
+    rows = (
+        Mailing.clients.through.objects.filter(mailing_id=mailing.id)
+        .annotate(domain=email_domain())
+        .order_by("domain", "client_id")
+        .values_list("domain", "client_id")
+        .iterator(chunk_size=chunk_size)
+    )
+
+    mixed = None
+    for domain, group in groupby(rows, key=itemgetter(0)):
+        client_ids = map(itemgetter(1), group)
+        chunk = list(islice(client_ids, chunk_size))
+        if len(chunk) < min_size and domain not in settings.MAILING_DOMAIN_ROUTES:
+            while chunk:
+                if mixed is None:
+                    mixed = Partition(None, (domain, chunk[0]), None, [], 0)
+                room = chunk_size - mixed.size
+                taken, chunk = chunk[:room], chunk[room:]
+                mixed = mixed._replace(last=(domain, taken[-1]), size=mixed.size + len(taken))
+                if mixed.size == chunk_size:
+                    yield mixed
+                    mixed = None
+            continue
+        if mixed is not None:
+            mixed.exclude.append(domain)
+        while chunk:
+            yield Partition(domain, (domain, chunk[0]), (domain, chunk[-1]), [], len(chunk))
+            chunk = list(islice(client_ids, chunk_size))
+    if mixed is not None:
+        yield mixed
+
+
+def partition_condition(first, last, exclude=()):
+    """
+    Условие на строки таблицы связи рассылки с клиентами: получатели между
+    ключами first и last (включительно) в порядке (домен, client_id), кроме
+    доменов exclude.
+    """
+    domain = email_domain()
+    (first_domain, first_id), (last_domain, last_id) = first, last
+    condition = (
+        Q(GreaterThan(domain, first_domain)) | Q(Exact(domain, first_domain), client_id__gte=first_id)
+    ) & (Q(LessThan(domain, last_domain)) | Q(Exact(domain, last_domain), client_id__lte=last_id))
+    if exclude:
+        condition &= ~Q(In(domain, exclude))
+    return condition
@@ -0,0 +1,196 @@
+import math
+import random
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Client, Mailing, MailingAttempt, Message
+from .rollups import rollup_attempts
+from .services import rebuild_counters
+from .stats import invalidate_home_stats
+
+# Домены получателей с весами: несколько крупных «почтовых сервисов»
+# и длинный хвост корпоративных доменов. Только зарезервированные домены
+# (RFC 2606), чтобы синтетические адреса никогда не ушли реальным людям.
+DOMAINS = [
+    ("gmail.example", 35),
+    ("yandex.example", 25),
+    ("mail.example", 20),
+    ("outlook.example", 10),
+    *((f"corp{i}.test", 1) for i in range(10)),
+]
+PERIODICITIES = [("once", 50), ("daily", 20), ("weekly", 20), ("monthly", 10)]
+STATUSES = [("created", 30), ("running", 50), ("completed", 20)]
+HISTORY_DAYS = 30
+BATCH_SIZE = 1000
+
+
+class SeedResult:
+    """
+    Метка запуска (префикс имён и адресов) и количество созданных объектов
+    каждого типа.
+    """
+
+    def __init__(self, run):
+        self.run = run
+        self.users = 0
+        self.clients = 0
+        self.messages = 0
+        self.mailings = 0
+        self.recipients = 0
+        self.attempts = 0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __str__(self):
+        return (
+            f"Запуск {self.run}. Пользователей: {self.users}, клиентов: {self.clients}, сообщений: {self.messages}, "
+            f"рассылок: {self.mailings}, получателей в рассылках: {self.recipients}, "
+            f"попыток: {self.attempts}"
+        )
+
+
+def weighted(rng, choices):
+    values, weights = zip(*choices)
+    return rng.choices(values, weights)[0]
+
+
+def recipients_count(rng, mean, limit):
+    """
+    Размер списка получателей рассылки: логнормальное распределение
+    со средним около mean — много небольших рассылок и немного крупных.
+    """
+    sigma = 0.75
+    count = int(rng.lognormvariate(math.log(mean) - sigma**2 / 2, sigma))
+    return min(max(count, 1), limit)
+
+
+@transaction.atomic
+def seed(
+    users=10,
+    clients_per_user=1000,
+    messages_per_user=10,
+    mailings_per_user=20,
+    recipients_per_mailing=200,
+    attempts_per_mailing=20,
+    random_seed=None,
+):
+    """
+    Заполняет базу синтетическими данными для бенчмарков: пользователи,
+    их клиенты и сообщения, рассылки со случайным подмножеством клиентов
+    владельца и история попыток за последние HISTORY_DAYS дней.
+
+    Рассылки создаются без следующего запуска (next_run_at пуст), поэтому
+    сверщик планировщика их не отправляет. Все объекты вставляются
+    bulk_create пачками. Адреса получают общий
+    префикс запуска, поэтому повторное заполнение не конфликтует с
+    существующими данными. После вставки история попыток агрегируется
+    в статистику, а счётчики рассылок пересчитываются.
+    """
+    rng = random.Random(random_seed)
+    run = uuid.uuid4().hex[:8]
+    now = timezone.now()
+    result = SeedResult(run)
+
+    owners = get_user_model().objects.bulk_create(
+        get_user_model()(username=f"seed-{run}-{i}", email=f"seed-{run}-{i}@example.com")
+        for i in range(users)
+    )
+    result.users = len(owners)
+
+    mailings = []
+    for owner in owners:
+        clients = Client.objects.bulk_create(
+            (
+                Client(
+                    email=f"{run}-u{owner.id}-c{i}@{weighted(rng, DOMAINS)}",
+                    full_name=f"Клиент {i}",
+                    owner=owner,
+                )
+                for i in range(clients_per_user)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        messages = Message.objects.bulk_create(
+            Message(subject=f"Новости {i}", body="Здравствуйте, {{ full_name }}!", owner=owner)
+            for i in range(messages_per_user)
+        )
+        owner_mailings = Mailing.objects.bulk_create(
+            seed_mailing(rng, now, rng.choice(messages), owner) for _ in range(mailings_per_user)
+        )
+        result.clients += len(clients)
+        result.messages += len(messages)
+        result.mailings += len(owner_mailings)
+
+        client_ids = [client.id for client in clients]
+        links = (
+            Mailing.clients.through(mailing_id=mailing.id, client_id=client_id)
+            for mailing in owner_mailings
+            for client_id in rng.sample(
+                client_ids, recipients_count(rng, recipients_per_mailing, len(client_ids))
+            )
+        )
+        result.recipients += len(
+            Mailing.clients.through.objects.bulk_create(links, batch_size=BATCH_SIZE)
+        )
+        mailings.extend(owner_mailings)
+
+    result.attempts = seed_attempts(rng, now, mailings, attempts_per_mailing)
+    rollup_attempts()
+    rebuild_counters(Mailing.objects.filter(id__in=[mailing.id for mailing in mailings]))
+    transaction.on_commit(invalidate_home_stats)
+    return result
+
+
+def seed_mailing(rng, now, message, owner):
+    status = weighted(rng, STATUSES)
+    first_send_time = now - timedelta(days=rng.randint(0, HISTORY_DAYS), minutes=rng.randint(0, 1439))
+    mailing = Mailing(
+        first_send_time=first_send_time,
+        end_time=first_send_time + timedelta(days=rng.randint(1, 2 * HISTORY_DAYS)),
+        periodicity=weighted(rng, PERIODICITIES),
+        status=status,
+        last_sent_at=None if status == "created" else first_send_time,
+        message=message,
+        owner=owner,
+    )
+    # bulk_create не вызывает save(): next_run_at остаётся пустым, и
+    # синтетические рассылки не попадают в расписание
+    return mailing
+
+
+def seed_attempts(rng, now, mailings, attempts_per_mailing):
+    """
+    Создаёт историю попыток отправленных рассылок и равномерно
+    распределяет её по последним HISTORY_DAYS дням.
+    """
+    attempts = MailingAttempt.objects.bulk_create(
+        (
+            MailingAttempt(
+                mailing=mailing,
+                status="success" if rng.random() < 0.9 else "failed",
+                server_response="OK",
+            )
+            for mailing in mailings
+            if mailing.status != "created"
+            for _ in range(attempts_per_mailing)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    if not attempts:
+        return 0
+
+    # attempt_time заполняется auto_now_add, поэтому время задаётся
+    # отдельными UPDATE по диапазонам id — по одному на день истории
+    ids = sorted(attempt.id for attempt in attempts)
+    per_day = math.ceil(len(ids) / HISTORY_DAYS)
+    for day, start in enumerate(range(0, len(ids), per_day), start=1):
+        day_ids = ids[start:start + per_day]
+        MailingAttempt.objects.filter(id__gte=day_ids[0], id__lte=day_ids[-1]).update(
+            attempt_time=now - timedelta(days=day, seconds=rng.randint(0, 86399))
+        )
+    return len(ids)
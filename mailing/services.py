@@ -1,77 +1,797 @@
 import logging
+import queue
+import random
+import smtplib
+import time
+import uuid
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import partial
+from itertools import islice
 
 from django.conf import settings
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
-from .models import Mailing, MailingAttempt
+from .metrics import EMAILS_TOTAL, SEND_PHASE_SECONDS, SEND_SECONDS
+from .models import Delivery, DeliveryRollup, Mailing, MailingAttempt, RollupCheckpoint, Suppression
+from .personalization import compile_message
+from .ratelimit import RateLimiter
+from .routing import domain_of, route_for
+from .rollups import CHECKPOINT_NAME
+from .suppression import SuppressionFilter, normalize_email, suppression_scope
 
 logger = logging.getLogger(__name__)
 
+# Получатель рассылки: только поля, нужные для отправки
+Recipient = namedtuple("Recipient", ["id", "email", "full_name"])
 
-def send_mailing(mailing_id):
+# Ошибки уровня соединения: после них соединение пересоздаётся, а письмо
+# отправляется повторно. Остальные ошибки относятся к конкретному получателю.
+CONNECTION_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    ConnectionError,
+    TimeoutError,
+)
+
+# Допуск на расхождение часов воркеров: задача повтора может прийти
+# немного раньше записанного next_retry_at
+RETRY_CLOCK_SKEW = timedelta(seconds=30)
+
+
+def is_transient(error):
+    """
+    Временная ли ошибка отправки: ответы SMTP 4xx, обрыв соединения и таймаут
+    имеет смысл повторить позже. Ответы 5xx и прочие ошибки — постоянные.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(400 <= code < 500 for code in codes)
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return isinstance(error, CONNECTION_ERRORS)
+
+
+def is_hard_bounce(error):
+    """
+    Постоянный отказ сервера принять письмо для получателя (ответ 5xx на RCPT).
+    """
+    if not isinstance(error, smtplib.SMTPRecipientsRefused):
+        return False
+    codes = [code for code, _ in error.recipients.values()]
+    return bool(codes) and all(500 <= code < 600 for code in codes)
+
+
+def retry_delay(retries):
+    """
+    Задержка перед очередным повтором, с: растёт вдвое с каждым повтором от
+    MAILING_RETRY_BASE_DELAY до MAILING_RETRY_MAX_DELAY. Половина задержки
+    случайна, чтобы повторы после общего сбоя не пришли на сервер разом.
     """
-    Отправляет рассылку по её ID.
+    delay = min(settings.MAILING_RETRY_BASE_DELAY * 2**retries, settings.MAILING_RETRY_MAX_DELAY)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def batched(iterable, size):
+    """
+    Разбивает итерируемый объект на списки длиной не больше size.
+    """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class PooledConnection:
+    """
+    Открытое соединение почтового бэкенда со счётчиком отправленных писем.
+    """
+
+    def __init__(self, backend=None, **kwargs):
+        self.backend = get_connection(backend, fail_silently=False, **kwargs)
+        self.sent = 0
+
+    def open(self):
+        if self.backend.open():
+            self.sent = 0
+
+    def close(self):
+        try:
+            self.backend.close()
+        except Exception as e:
+            logger.warning(f"Ошибка при закрытии соединения: {e}")
+        self.sent = 0
+
+    def send(self, message):
+        self.open()
+        self.backend.send_messages([message])
+        self.sent += 1
+
+
+class SMTPConnectionPool:
+    """
+    Пул долгоживущих соединений с почтовым сервером на время одного запуска
+    рассылки.
+
+    Соединение переиспользуется для многих писем и пересоздаётся после
+    max_messages писем или после обрыва связи. Пул потокобезопасен:
+    одновременно может быть выдано до size соединений. Если заданы лимиты
+    MAILING_RATE_LIMIT_*, каждое письмо ждёт токен ограничителя скорости.
+    """
+
+    def __init__(self, size=None, max_messages=None, backend=None, rate_limiter=None, **kwargs):
+        self.size = size or settings.MAILING_SMTP_POOL_SIZE
+        self.max_messages = max_messages or settings.MAILING_SMTP_MAX_MESSAGES_PER_CONNECTION
+        self.rate_limiter = rate_limiter or RateLimiter.from_settings(kwargs.get("host"))
+        self._idle = queue.LifoQueue()
+        self._all = []
+        for _ in range(self.size):
+            connection = PooledConnection(backend, **kwargs)
+            self._all.append(connection)
+            self._idle.put(connection)
+
+    @contextmanager
+    def connection(self):
+        connection = self._idle.get()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def send_message(self, connection, message):
+        """
+        Отправляет одно письмо через выданное соединение.
+        Возвращает None при успехе или исключение при ошибке.
+        """
+        if self.rate_limiter is not None:
+            for recipient in message.recipients():
+                self.rate_limiter.acquire(recipient)
+        if connection.sent >= self.max_messages:
+            connection.close()
+        try:
+            connection.send(message)
+        except CONNECTION_ERRORS as e:
+            logger.warning(f"Соединение с почтовым сервером потеряно ({e}), переподключаемся.")
+            connection.close()
+            try:
+                connection.send(message)
+            except Exception as retry_error:
+                connection.close()
+                return retry_error
+        except Exception as e:
+            return e
+        return None
+
+    def send_messages(self, messages):
+        """
+        Отправляет пачку писем через одно соединение пула.
+        Возвращает список результатов send_message в порядке писем.
+        """
+        with self.connection() as connection:
+            return [self.send_message(connection, message) for message in messages]
+
+    def close(self):
+        for connection in self._all:
+            connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ThreadedDeliveryEngine:
+    """
+    Движок отправки в пуле потоков: до concurrency SMTP-сессий одновременно.
+
+    Каждый из concurrency потоков отправляет письмо через соединение из
+    SMTPConnectionPool того же размера, поэтому одновременно открыто не
+    больше concurrency соединений. Работа с базой остаётся синхронной
+    и выполняется вызывающим кодом.
+    """
+
+    def __init__(self, concurrency=None, **kwargs):
+        self.concurrency = concurrency or settings.MAILING_ASYNC_CONCURRENCY
+        self.pool = SMTPConnectionPool(size=self.concurrency, **kwargs)
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+
+    def _send(self, message):
+        (error,) = self.pool.send_messages([message])
+        return error
+
+    def send_messages(self, messages):
+        """
+        Отправляет пачку писем параллельно.
+        Возвращает список ошибок (или None) в порядке писем.
+        """
+        return list(self.executor.map(self._send, messages))
+
+    def close(self):
+        self.executor.shutdown()
+        self.pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+DELIVERY_ENGINES = {
+    "pool": SMTPConnectionPool,
+    "threads": ThreadedDeliveryEngine,
+    # Прежнее имя движка "threads"
+    "async": ThreadedDeliveryEngine,
+}
+
+
+def get_delivery_engine(name=None, **kwargs):
+    """
+    Создаёт движок отправки по имени (по умолчанию MAILING_DELIVERY_ENGINE).
+    """
+    name = name or settings.MAILING_DELIVERY_ENGINE
+    try:
+        engine_class = DELIVERY_ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Неизвестный движок отправки: {name}")
+    return engine_class(**kwargs)
+
+
+class AttemptRecorder:
+    """
+    Буферизованная запись попыток отправки (MailingAttempt), состояния
+    доставки по получателям (Delivery) и счётчиков попыток рассылки.
+
+    Результаты копятся в памяти и сохраняются bulk_create каждые
+    flush_size записей, раз в flush_interval секунд и при выходе из блока
+    with. При падении воркера теряется не больше одного буфера.
+    Время попытки проставляется в момент сброса буфера.
+    """
+
+    def __init__(self, mailing, flush_size=None, flush_interval=None, run=None):
+        self.mailing = mailing
+        # Номер запуска для записей Delivery: по умолчанию текущий запуск рассылки
+        self.run = mailing.run_number if run is None else run
+        self.flush_size = flush_size or settings.MAILING_ATTEMPT_FLUSH_SIZE
+        self.flush_interval = flush_interval or settings.MAILING_ATTEMPT_FLUSH_INTERVAL
+        self.success_count = 0
+        self.failure_count = 0
+        self.suppressed_count = 0
+        self._buffer = []
+        self._deliveries = []
+        self._retries = []
+        self._bounces = []
+        self._flushed_at = time.monotonic()
+
+    def success(self, client, retries=0):
+        self.success_count += 1
+        self.add(client, "success", f"Письмо успешно отправлено на {client.email}", retries)
+        logger.info(f"Письмо отправлено: {client.email}")
+
+    def failure(self, client, error, retries=0):
+        """
+        Записывает ошибку отправки. После временной ошибки, пока не исчерпаны
+        MAILING_RETRY_MAX_ATTEMPTS повторов, получателю назначается повтор.
+        """
+        error_msg = f"Ошибка отправки на {client.email}: {error}"
+        self.failure_count += 1
+        retry_in = None
+        if is_transient(error) and retries < settings.MAILING_RETRY_MAX_ATTEMPTS:
+            retry_in = retry_delay(retries)
+            error_msg += f" (повтор через {retry_in:.0f} с)"
+        elif settings.MAILING_SUPPRESS_HARD_BOUNCES and is_hard_bounce(error):
+            self._bounces.append(client.email)
+        self.add(client, "failed", error_msg, retries, retry_in)
+        logger.error(error_msg)
+
+    def suppressed(self, client, reason):
+        """
+        Записывает получателя из списка подавления: письмо не отправлялось,
+        в счётчики попыток рассылки такая запись не входит.
+        """
+        self.suppressed_count += 1
+        reason = dict(Suppression.REASON_CHOICES).get(reason, reason)
+        self.add(client, "suppressed", f"Адрес {client.email} в списке подавления ({reason}), письмо не отправлено")
+
+    def add(self, client, status, server_response, retries=0, retry_in=None):
+        self._buffer.append(
+            MailingAttempt(mailing=self.mailing, status=status, server_response=server_response)
+        )
+        if status == "success":
+            state = "delivered"
+        elif status == "suppressed":
+            state = None
+        elif retry_in is not None:
+            state = "retrying"
+            self._retries.append((client.id, retries, retry_in))
+        else:
+            state = "failed"
+        if state is not None:
+            self._deliveries.append(
+                Delivery(
+                    mailing=self.mailing,
+                    client_id=client.id,
+                    state=state,
+                    run=self.run,
+                    retries=retries,
+                    next_retry_at=(
+                        timezone.now() + timedelta(seconds=retry_in) if retry_in is not None else None
+                    ),
+                )
+            )
+        if (
+            len(self._buffer) >= self.flush_size
+            or time.monotonic() - self._flushed_at >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            statuses = Counter(attempt.status for attempt in self._buffer)
+            successful, failed = statuses["success"], statuses["failed"]
+            with SEND_PHASE_SECONDS.time(phase="write_attempts"), transaction.atomic():
+                MailingAttempt.objects.bulk_create(self._buffer)
+                Mailing.objects.filter(id=self.mailing.id).update(
+                    total_attempts=F("total_attempts") + successful + failed,
+                    successful_attempts=F("successful_attempts") + successful,
+                    failed_attempts=F("failed_attempts") + failed,
+                )
+                Delivery.objects.bulk_create(
+                    self._deliveries,
+                    update_conflicts=True,
+                    unique_fields=["mailing", "client"],
+                    update_fields=["state", "updated_at", "run", "retries", "next_retry_at"],
+                )
+                Suppression.objects.bulk_create(
+                    [Suppression(email=normalize_email(email), reason="bounce") for email in self._bounces],
+                    ignore_conflicts=True,
+                )
+                if self._retries:
+                    transaction.on_commit(partial(schedule_retries, self.mailing.id, self._retries))
+            for status, count in statuses.items():
+                EMAILS_TOTAL.inc(count, status=status)
+            self._buffer = []
+            self._deliveries = []
+            self._retries = []
+            self._bounces = []
+        self._flushed_at = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+
+def schedule_retries(mailing_id, retries):
+    """
+    Ставит в очередь Celery отдельную задачу повтора на каждого получателя
+    с временной ошибкой: нагрузка от повторов растёт с числом ошибок, а не
+    с размером списка. Потерянные задачи подбирает requeue_overdue_retries.
+    """
+    from .tasks import retry_recipient_task
+
+    for client_id, retry_number, delay in retries:
+        try:
+            retry_recipient_task.apply_async((mailing_id, client_id, retry_number), countdown=delay)
+        except Exception as e:
+            logger.warning(f"Не удалось поставить повтор для клиента {client_id} в очередь: {e}")
+
+
+def rebuild_counters(mailings=None):
+    """
+    Пересчитывает счётчики попыток рассылок одним UPDATE с подзапросами.
+
+    Попытки до отметки агрегации берутся из посуточной статистики: часть из
+    них может быть уже перенесена в архив и удалена. Более новые попытки
+    считаются по таблице MailingAttempt.
+    """
+    checkpoint = Coalesce(
+        Subquery(
+            RollupCheckpoint.objects.filter(name=CHECKPOINT_NAME).values("last_attempt_id")
+        ),
+        Value(0),
+    )
+
+    def rolled_up(field):
+        rollups = (
+            DeliveryRollup.objects.filter(period="day", mailing=OuterRef("pk"))
+            .values("mailing")
+            .annotate(total=Sum(field))
+            .values("total")
+        )
+        return Coalesce(Subquery(rollups, output_field=IntegerField()), Value(0))
+
+    def count(**filters):
+        attempts = (
+            MailingAttempt.objects.filter(mailing=OuterRef("pk"), id__gt=checkpoint, **filters)
+            .values("mailing")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        return Coalesce(Subquery(attempts, output_field=IntegerField()), Value(0))
+
+    successful = rolled_up("successful") + count(status="success")
+    failed = rolled_up("failed") + count(status="failed")
+    mailings = Mailing.objects.all() if mailings is None else mailings
+    return mailings.update(
+        total_attempts=successful + failed,
+        successful_attempts=successful,
+        failed_attempts=failed,
+    )
+
+
+def get_sendable_mailing(mailing_id):
+    """
+    Возвращает рассылку, если её можно отправлять прямо сейчас, иначе None.
+    Просроченные рассылки переводятся в статус 'completed'.
     """
     try:
-        mailing = Mailing.objects.get(id=mailing_id)
+        mailing = Mailing.objects.select_related("message").get(id=mailing_id)
     except Mailing.DoesNotExist:
         logger.error(f"Рассылка с ID {mailing_id} не найдена.")
-        return False
+        return None
 
     if mailing.status != "running":
         logger.info(f"Рассылка {mailing_id} не в статусе 'running'. Пропускаем.")
-        return False
-
-    from django.utils import timezone
+        return None
 
     now = timezone.now()
     if mailing.first_send_time > now:
         logger.info(f"Время отправки рассылки {mailing_id} ещё не наступило.")
-        return False
+        return None
     if mailing.end_time < now:
         logger.info(f"Время окончания рассылки {mailing_id} уже прошло.")
         mailing.status = "completed"  # Можно автоматически завершать
-        mailing.save()
-        return False
+        mailing.save(update_fields=["status"])
+        return None
 
-    message = mailing.message
-    clients = mailing.clients.all()
+    return mailing
 
-    if not clients.exists():
-        logger.warning(f"В рассылке {mailing_id} нет клиентов.")
-        return False
 
-    success_count = 0
-    failure_count = 0
+def unclaimed(now):
+    return Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)
 
-    for client in clients:
-        try:
-            send_mail(
-                subject=message.subject,
-                message=message.body,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[client.email],
-                fail_silently=False,
-            )
 
-            MailingAttempt.objects.create(
-                mailing=mailing,
-                status="success",
-                server_response=f"Письмо успешно отправлено на {client.email}",
-            )
-            success_count += 1
-            logger.info(f"Письмо отправлено: {client.email}")
+def due_mailings(now=None):
+    """
+    Рассылки, время очередного запуска которых наступило и которые сейчас
+    не обрабатываются другим воркером.
+    """
+    now = now or timezone.now()
+    return (
+        Mailing.objects.filter(next_run_at__lte=now)
+        .filter(unclaimed(now))
+        .exclude(status="completed")
+    )
+
+
+def claim_mailing(mailing_id):
+    """
+    Захватывает рассылку для обработки на MAILING_CLAIM_LEASE секунд.
+
+    Захват — один условный UPDATE, поэтому из нескольких воркеров и тиков
+    планировщика рассылку получает ровно один. Если воркер упал, аренда
+    истекает и рассылку подхватывает следующий тик.
+    Возвращает токен захвата, если рассылка захвачена, иначе None.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    claimed = (
+        Mailing.objects.filter(id=mailing_id)
+        .filter(unclaimed(now))
+        .update(
+            claimed_until=now + timedelta(seconds=settings.MAILING_CLAIM_LEASE),
+            claim_token=token,
+        )
+    )
+    return token if claimed == 1 else None
+
+
+def renew_claim(mailing_id, token):
+    """
+    Продлевает аренду захваченной рассылки во время длинной отправки.
+    Аренда продлевается, только пока рассылка захвачена с токеном token:
+    воркер, чью истёкшую аренду перехватил другой, её не продлит.
+    Возвращает True, если аренда продлена.
+    """
+    renewed = Mailing.objects.filter(
+        id=mailing_id, claimed_until__isnull=False, claim_token=token
+    ).update(claimed_until=timezone.now() + timedelta(seconds=settings.MAILING_CLAIM_LEASE))
+    if not renewed:
+        logger.warning(f"Аренда рассылки {mailing_id} перехвачена другим воркером или снята.")
+    return renewed == 1
+
+
+def release_mailing(mailing_id, token=None):
+    """
+    Снимает аренду рассылки. С токеном — только если рассылка всё ещё
+    захвачена с ним, чтобы не снять чужой захват.
+    """
+    mailings = Mailing.objects.filter(id=mailing_id)
+    if token is not None:
+        mailings = mailings.filter(claim_token=token)
+    mailings.update(claimed_until=None)
+
+
+def complete_run(mailing):
+    """
+    Отмечает запуск рассылки завершённым и переносит её на следующий период.
+    Рассылки без следующего запуска переводятся в статус 'completed'.
+    """
+    mailing.last_sent_at = timezone.now()
+    mailing.claimed_until = None
+    mailing.run_number += 1
+    if mailing.compute_next_run() is None:
+        mailing.status = "completed"
+    mailing.save(update_fields=["last_sent_at", "claimed_until", "run_number", "status"])
+    schedule_mailing(mailing)
 
+
+def schedule_mailing(mailing):
+    """
+    Ставит задачу start_mailing на время следующего запуска рассылки
+    (Celery ETA) и сохраняет её id в scheduled_task_id, прежняя задача
+    отзывается. Запуски дальше MAILING_SCHEDULE_HORIZON секунд не ставятся:
+    брокер может повторно выдать задачу с долгим ETA, такие запуски ставит
+    сверщик send_scheduled_mailings, когда они попадут в горизонт.
+    Задача отправляется в брокер после фиксации транзакции.
+    """
+    from .tasks import start_mailing
+
+    previous = mailing.scheduled_task_id
+    eta = mailing.next_run_at
+    horizon = timezone.now() + timedelta(seconds=settings.MAILING_SCHEDULE_HORIZON)
+    task_id = str(uuid.uuid4()) if eta is not None and eta <= horizon else ""
+    if not (previous or task_id):
+        return
+    mailing.scheduled_task_id = task_id
+    Mailing.objects.filter(id=mailing.id).update(scheduled_task_id=task_id)
+
+    def enqueue():
+        try:
+            if previous:
+                start_mailing.app.control.revoke(previous)
+            if task_id:
+                start_mailing.apply_async((mailing.id,), eta=eta, task_id=task_id)
         except Exception as e:
+            # Рассылку без задачи запустит сверщик после MAILING_SCHEDULE_GRACE
+            logger.warning(f"Не удалось поставить запуск рассылки {mailing.id} в очередь: {e}")
 
-            error_msg = f"Ошибка отправки на {client.email}: {e}"
-            MailingAttempt.objects.create(
-                mailing=mailing, status="failed", server_response=error_msg
-            )
-            failure_count += 1
-            logger.error(error_msg)
+    transaction.on_commit(enqueue)
+
+
+def unscheduled_mailings(now=None):
+    """
+    Незавершённые рассылки без задачи запуска, чей запуск попал в горизонт
+    планирования MAILING_SCHEDULE_HORIZON.
+    """
+    now = now or timezone.now()
+    horizon = now + timedelta(seconds=settings.MAILING_SCHEDULE_HORIZON)
+    return (
+        Mailing.objects.filter(next_run_at__lte=horizon, scheduled_task_id="")
+        .exclude(status="completed")
+    )
+
+
+def overdue_mailings(now=None):
+    """
+    Рассылки, время запуска которых прошло больше MAILING_SCHEDULE_GRACE
+    секунд назад, а рассылка так и не запущена: задача ETA потеряна
+    брокером или не была поставлена.
+    """
+    now = now or timezone.now()
+    return due_mailings(now).filter(
+        next_run_at__lte=now - timedelta(seconds=settings.MAILING_SCHEDULE_GRACE)
+    )
+
+
+def delivered_in_current_run(mailing):
+    """
+    Условие Exists для строк таблицы получателей: клиенту рассылка уже
+    доставлена в текущем запуске (Delivery с номером запуска рассылки).
+    """
+    delivered = Delivery.objects.filter(
+        mailing_id=mailing.id,
+        client_id=OuterRef("client_id"),
+        state="delivered",
+        run=mailing.run_number,
+    )
+    return Exists(delivered)
+
+
+def iter_recipients(mailing, client_ids=None, chunk_size=None, where=None):
+    """
+    Потоково выдаёт получателей рассылки пачками Recipient.
+
+    Получатели читаются из таблицы связи рассылки с клиентами keyset-пагинацией
+    по client_id, выбираются только id, email и full_name. Клиенты, которым
+    рассылка уже доставлена в текущем запуске, пропускаются. Память не
+    зависит от размера списка. client_ids или условие where на строки таблицы
+    связи ограничивают выборку частью получателей.
+    """
+    chunk_size = chunk_size or settings.MAILING_SEND_BATCH_SIZE
+    rows = (
+        Mailing.clients.through.objects.filter(mailing_id=mailing.id)
+        .filter(~delivered_in_current_run(mailing))
+        .order_by("client_id")
+        .values_list("client_id", "client__email", "client__full_name")
+    )
+    if client_ids is not None:
+        rows = rows.filter(client_id__in=client_ids)
+    if where is not None:
+        rows = rows.filter(where)
+
+    last_id = 0
+    while True:
+        with SEND_PHASE_SECONDS.time(phase="read_recipients"):
+            chunk = [Recipient(*row) for row in rows.filter(client_id__gt=last_id)[:chunk_size]]
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1].id
+
+
+def personalize(subject, body, client):
+    """
+    Письмо получателю client по скомпилированным шаблонам темы и текста.
+    """
+    return EmailMessage(
+        subject=subject.render(client),
+        body=body.render(client),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[client.email],
+    )
+
+
+def deliver(mailing, client_ids=None, engine=None, claim=None, where=None, **engine_options):
+    """
+    Отправляет сообщение рассылки её получателям и записывает попытки.
+    Тема и тело персонализируются для каждого получателя.
+    client_ids или условие where (см. iter_recipients) ограничивают отправку
+    частью получателей. Клиенты, которым
+    рассылка уже доставлена, пропускаются. Адреса из списка подавления
+    отсеиваются пачками по фильтру, загруженному один раз на запуск,
+    и записываются в журнал попыток со статусом 'suppressed'.
+    engine — имя движка отправки из DELIVERY_ENGINES, engine_options —
+    параметры движка и соединения (например, маршрут домена). claim — токен
+    захвата рассылки: после каждой пачки аренда продлевается.
+    Возвращает кортеж (успешно, ошибок).
+    """
+    subject, body = compile_message(mailing.message)
+    suppression = SuppressionFilter.for_owner(mailing.owner_id)
+
+    with get_delivery_engine(engine, **engine_options) as pool, AttemptRecorder(mailing) as recorder:
+        for batch in iter_recipients(mailing, client_ids, where=where):
+            if suppressed := suppression.suppressed(batch):
+                for client in batch:
+                    if client.id in suppressed:
+                        recorder.suppressed(client, suppressed[client.id])
+                batch = [client for client in batch if client.id not in suppressed]
+
+            with SEND_PHASE_SECONDS.time(phase="build_messages"):
+                emails = [personalize(subject, body, client) for client in batch]
+
+            with SEND_PHASE_SECONDS.time(phase="smtp"):
+                errors = pool.send_messages(emails)
+
+            for client, error in zip(batch, errors):
+                if error is None:
+                    recorder.success(client)
+                else:
+                    recorder.failure(client, error)
+
+            if claim is not None:
+                renew_claim(mailing.id, claim)
+
+    return recorder.success_count, recorder.failure_count
+
+
+def send_mailing(mailing_id, engine=None, claim=None):
+    """
+    Отправляет рассылку по её ID. claim — токен захвата рассылки.
+    """
+    mailing = get_sendable_mailing(mailing_id)
+    if mailing is None:
+        return False
+
+    if not mailing.clients.exists():
+        logger.warning(f"В рассылке {mailing_id} нет клиентов.")
+        complete_run(mailing)
+        return False
+
+    with SEND_SECONDS.time():
+        success_count, failure_count = deliver(mailing, engine=engine, claim=claim)
+        complete_run(mailing)
 
     logger.info(
         f"Рассылка {mailing_id} завершена. Успешно: {success_count}, Ошибок: {failure_count}"
     )
     return True
+
+
+def retry_recipient(mailing_id, client_id, retries, engine=None):
+    """
+    Повторяет отправку рассылки одному получателю после временной ошибки.
+
+    retries — число повторов, записанное в Delivery при постановке в
+    очередь. Повтор захватывается условным UPDATE, переносящим next_retry_at
+    на MAILING_RETRY_GRACE секунд вперёд (аренда): дубль задачи или
+    устаревшая задача ничего не отправят, а если воркер упадёт до записи
+    результата, по окончании аренды повтор подхватит requeue_overdue_retries.
+    Результат записывается в запуск, к которому относится доставка. Если
+    рассылка за это время остановлена или истекла, повтор отменяется.
+    Возвращает True, если письмо доставлено.
+    """
+    now = timezone.now()
+    deliveries = Delivery.objects.filter(mailing_id=mailing_id, client_id=client_id)
+    claimed = deliveries.filter(
+        state="retrying", retries=retries, next_retry_at__lte=now + RETRY_CLOCK_SKEW
+    ).update(next_retry_at=now + timedelta(seconds=settings.MAILING_RETRY_GRACE))
+    if not claimed:
+        logger.info(f"Повтор рассылки {mailing_id} клиенту {client_id} уже не нужен.")
+        return False
+    run = deliveries.values_list("run", flat=True).get()
+
+    mailing = Mailing.objects.select_related("message").get(id=mailing_id)
+    if mailing.status != "running" or mailing.end_time < now:
+        deliveries.update(state="failed", next_retry_at=None)
+        logger.info(f"Рассылка {mailing_id} остановлена или завершена, повтор клиенту {client_id} отменён.")
+        return False
+
+    recipient = (
+        Mailing.clients.through.objects.filter(mailing_id=mailing_id, client_id=client_id)
+        .values_list("client_id", "client__email", "client__full_name")
+        .first()
+    )
+    if recipient is None:
+        deliveries.update(state="failed", next_retry_at=None)
+        logger.info(f"Клиент {client_id} удалён из рассылки {mailing_id}, повтор отменён.")
+        return False
+
+    recipient = Recipient(*recipient)
+    reason = (
+        suppression_scope(mailing.owner_id)
+        .filter(email=normalize_email(recipient.email))
+        .values_list("reason", flat=True)
+        .first()
+    )
+    if reason is not None:
+        deliveries.update(state="failed", next_retry_at=None)
+        with AttemptRecorder(mailing, run=run) as recorder:
+            recorder.suppressed(recipient, reason)
+        return False
+
+    subject, body = compile_message(mailing.message)
+    route = route_for(domain_of(recipient.email)) if settings.MAILING_FANOUT_BY_DOMAIN else {}
+    with get_delivery_engine(engine, **route) as pool:
+        (error,) = pool.send_messages([personalize(subject, body, recipient)])
+
+    with AttemptRecorder(mailing, run=run) as recorder:
+        if error is None:
+            recorder.success(recipient, retries + 1)
+        else:
+            recorder.failure(recipient, error, retries + 1)
+    return error is None
+
+
+def overdue_retries(now=None):
+    """
+    Повторы, задачи которых должны были выполниться больше
+    MAILING_RETRY_GRACE секунд назад: вероятно, потеряны брокером или
+    воркер упал после захвата повтора и аренда истекла. Повторы
+    остановленных и истёкших рассылок не возвращаются.
+    """
+    now = now or timezone.now()
+    return Delivery.objects.filter(
+        state="retrying",
+        next_retry_at__lt=now - timedelta(seconds=settings.MAILING_RETRY_GRACE),
+        mailing__status="running",
+        mailing__end_time__gte=now,
+    )
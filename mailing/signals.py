@@ -0,0 +1,34 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import stats
+from .models import Client, Mailing
+
+
+@receiver(post_save, sender=Mailing)
+def mailing_saved(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(stats.adjust, stats.TOTAL_MAILINGS_KEY, 1))
+    # Статус мог измениться: активные рассылки будут пересчитаны
+    transaction.on_commit(stats.invalidate_active_mailings)
+
+
+@receiver(post_delete, sender=Mailing)
+def mailing_deleted(sender, instance, **kwargs):
+    transaction.on_commit(partial(stats.adjust, stats.TOTAL_MAILINGS_KEY, -1))
+    if instance.status == "running":
+        transaction.on_commit(partial(stats.adjust, stats.ACTIVE_MAILINGS_KEY, -1))
+
+
+@receiver(post_save, sender=Client)
+def client_saved(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(stats.adjust, stats.UNIQUE_CLIENTS_KEY, 1))
+
+
+@receiver(post_delete, sender=Client)
+def client_deleted(sender, instance, **kwargs):
+    transaction.on_commit(partial(stats.adjust, stats.UNIQUE_CLIENTS_KEY, -1))
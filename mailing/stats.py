@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Client, Mailing
+
+# Счётчики главной страницы хранятся в общем кеше под отдельными ключами,
+# чтобы их можно было обновлять по одному (incr/decr) из сигналов моделей.
+TOTAL_MAILINGS_KEY = "home_stats:total_mailings"
+ACTIVE_MAILINGS_KEY = "home_stats:active_mailings"
+UNIQUE_CLIENTS_KEY = "home_stats:unique_clients"
+
+
+def get_home_stats():
+    """
+    Возвращает счётчики главной страницы из кеша, досчитывая недостающие.
+    Количество рассылок и активных рассылок считается одним запросом,
+    поэтому холодный процесс выполняет не больше двух запросов.
+    """
+    stats = cache.get_many([TOTAL_MAILINGS_KEY, ACTIVE_MAILINGS_KEY, UNIQUE_CLIENTS_KEY])
+    missing = {}
+
+    if TOTAL_MAILINGS_KEY not in stats or ACTIVE_MAILINGS_KEY not in stats:
+        counts = Mailing.objects.aggregate(
+            total=Count("id"), active=Count("id", filter=Q(status="running"))
+        )
+        missing[TOTAL_MAILINGS_KEY] = counts["total"]
+        missing[ACTIVE_MAILINGS_KEY] = counts["active"]
+
+    if UNIQUE_CLIENTS_KEY not in stats:
+        missing[UNIQUE_CLIENTS_KEY] = Client.objects.count()
+
+    if missing:
+        cache.set_many(missing, settings.HOME_STATS_CACHE_TIMEOUT)
+        stats.update(missing)
+
+    return {
+        "total_mailings": stats[TOTAL_MAILINGS_KEY],
+        "active_mailings": stats[ACTIVE_MAILINGS_KEY],
+        "unique_clients": stats[UNIQUE_CLIENTS_KEY],
+    }
+
+
+def adjust(key, delta):
+    """
+    Изменяет закешированный счётчик на delta. Если счётчика нет в кеше,
+    он будет посчитан при следующем запросе.
+    """
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        pass
+
+
+def invalidate_active_mailings():
+    cache.delete(ACTIVE_MAILINGS_KEY)
+
+
+def invalidate_home_stats():
+    """
+    Сбрасывает все счётчики главной страницы, например после массовой
+    вставки, минующей сигналы моделей.
+    """
+    cache.delete_many([TOTAL_MAILINGS_KEY, ACTIVE_MAILINGS_KEY, UNIQUE_CLIENTS_KEY])
@@ -0,0 +1,99 @@
+import hashlib
+from array import array
+from bisect import bisect_left
+
+from django.db.models import Max, Q
+
+from .models import Suppression
+
+
+def normalize_email(email):
+    return email.strip().lower()
+
+
+def email_hash(email):
+    """
+    64-битный хеш нормализованного адреса.
+    """
+    digest = hashlib.blake2b(normalize_email(email).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def suppression_scope(owner_id):
+    """
+    Подавленные адреса, действующие для рассылок владельца: общие и его.
+    """
+    return Suppression.objects.filter(Q(owner__isnull=True) | Q(owner_id=owner_id))
+
+
+class SuppressionFilter:
+    """
+    Список подавления владельца в памяти процесса.
+
+    Загружается один раз на запуск рассылки и хранит только отсортированный
+    массив 64-битных хешей адресов (8 байт на адрес). Проверка адреса —
+    двоичный поиск без обращения к базе. Совпадение хеша подтверждается
+    точной проверкой по таблице: одним запросом на пачку получателей и только
+    если в пачке есть кандидаты, поэтому коллизия хешей не подавит лишний адрес.
+    """
+
+    # Загруженные фильтры процесса: {owner_id: (версия, фильтр)}
+    _cache = {}
+    CACHE_SIZE = 64
+
+    def __init__(self, owner_id, hashes):
+        self.owner_id = owner_id
+        self.hashes = array("q", sorted(hashes))
+
+    @classmethod
+    def load(cls, owner_id):
+        emails = suppression_scope(owner_id).values_list("email", flat=True)
+        return cls(owner_id, (email_hash(email) for email in emails.iterator(chunk_size=10000)))
+
+    @classmethod
+    def for_owner(cls, owner_id):
+        """
+        Фильтр владельца из кеша процесса, чтобы части одного запуска
+        не загружали список заново. Версия списка — наибольший id в нём:
+        новая запись меняет версию и фильтр перезагружается. Удалённые
+        записи остаются в фильтре до перезагрузки, но точная проверка
+        по таблице их не подавит.
+        """
+        version = suppression_scope(owner_id).aggregate(version=Max("id"))["version"]
+        cached = cls._cache.pop(owner_id, None)
+        if cached is None or cached[0] != version:
+            cached = (version, cls.load(owner_id))
+        cls._cache[owner_id] = cached
+        while len(cls._cache) > cls.CACHE_SIZE:
+            del cls._cache[next(iter(cls._cache))]
+        return cached[1]
+
+    @classmethod
+    def clear_cache(cls):
+        cls._cache.clear()
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def might_contain(self, email):
+        value = email_hash(email)
+        index = bisect_left(self.hashes, value)
+        return index < len(self.hashes) and self.hashes[index] == value
+
+    def suppressed(self, recipients):
+        """
+        Возвращает {id: причина} подавленных получателей пачки.
+        """
+        candidates = [recipient for recipient in recipients if self.might_contain(recipient.email)]
+        if not candidates:
+            return {}
+        reasons = dict(
+            suppression_scope(self.owner_id)
+            .filter(email__in={normalize_email(recipient.email) for recipient in candidates})
+            .values_list("email", "reason")
+        )
+        return {
+            recipient.id: reasons[normalize_email(recipient.email)]
+            for recipient in candidates
+            if normalize_email(recipient.email) in reasons
+        }
@@ -1,39 +1,254 @@
-from celery import shared_task
-from .services import send_mailing
-from .models import Mailing
+import logging
+
+from celery import chord, shared_task
+from django.conf import settings
+from django.db.models import Q
 from django.utils import timezone
+from .services import (
+    batched,
+    claim_mailing,
+    complete_run,
+    deliver,
+    get_sendable_mailing,
+    overdue_mailings,
+    overdue_retries,
+    release_mailing,
+    retry_recipient,
+    schedule_mailing,
+    send_mailing,
+    unscheduled_mailings,
+)
+from .archive import archive_attempts
+from .metrics import SCHEDULER_MAILINGS_TOTAL, SCHEDULER_TICK_SECONDS
+from .models import Mailing
+from .rollups import rollup_attempts
+from .routing import partition_condition, partition_recipients, route_for
+from .stats import invalidate_active_mailings
 
-@shared_task
-def send_scheduled_mailings():
+logger = logging.getLogger(__name__)
+
+
+def dispatch_mailing_chunks(mailing, engine=None, claim=None):
     """
-    Задача Celery для отправки активных рассылок.
-    Вызывается по расписанию через Celery Beat.
+    Разбивает получателей рассылки на части по MAILING_FANOUT_CHUNK_SIZE
+    клиентов и отправляет каждую часть отдельной задачей. Если включён
+    MAILING_FANOUT_BY_DOMAIN, части собираются по доменам получателей.
+    После выполнения всех частей вызывается finalize_mailing. claim — токен
+    захвата рассылки, части продлевают аренду с ним.
+
+    id получателей читаются курсором, а задачам передаются только границы
+    частей: список подписей для chord и сообщения брокера не растут
+    с размером части.
     """
-    now = timezone.now()
+    if settings.MAILING_FANOUT_BY_DOMAIN:
+        chunks = [
+            send_domain_partition.s(
+                mailing.id, part.first, part.last, part.domain, part.exclude, claim
+            )
+            for part in partition_recipients(mailing)
+        ]
+    else:
+        client_ids = (
+            Mailing.clients.through.objects.filter(mailing_id=mailing.id)
+            .order_by('client_id')
+            .values_list('client_id', flat=True)
+            .iterator()
+        )
+        chunks = [
+            send_mailing_chunk.s(mailing.id, chunk[0], chunk[-1], engine, claim)
+            for chunk in batched(client_ids, settings.MAILING_FANOUT_CHUNK_SIZE)
+        ]
+    if not chunks:
+        logger.warning(f"В рассылке {mailing.id} нет клиентов.")
+        return False
 
-    mailings_to_send = Mailing.objects.filter(
-        status__in=['created', 'running'],
-        first_send_time__lte=now,
-        end_time__gte=now
-    )
+    chord(chunks)(finalize_mailing.s(mailing.id))
+    logger.info(f"Рассылка {mailing.id} разбита на {len(chunks)} задач.")
+    return True
 
-    sent_count = 0
-    for mailing in mailings_to_send:
-        success = send_mailing(mailing.id)
-        if success:
-            sent_count += 1
 
-            if mailing.status == 'created':
-                mailing.status = 'running'
-                mailing.save()
+def run_mailing(mailing_id, engine=None):
+    """
+    Отправляет рассылку целиком в текущей задаче или, если включён
+    MAILING_FANOUT, раздаёт её частями по воркерам.
+    Созданная рассылка при первом запуске переводится в статус 'running'.
+    Рассылка, захваченная другим воркером, пропускается.
+    """
+    claim = claim_mailing(mailing_id)
+    if claim is None:
+        logger.info(f"Рассылка {mailing_id} уже обрабатывается другим воркером.")
+        return False
+
+    if Mailing.objects.filter(id=mailing_id, status='created').update(status='running'):
+        invalidate_active_mailings()
+
+    if not settings.MAILING_FANOUT:
+        try:
+            return send_mailing(mailing_id, engine, claim)
+        finally:
+            release_mailing(mailing_id, claim)
+
+    # В режиме fan-out аренду снимает finalize_mailing
+    dispatched = False
+    try:
+        mailing = get_sendable_mailing(mailing_id)
+        dispatched = mailing is not None and dispatch_mailing_chunks(mailing, engine, claim)
+    finally:
+        if not dispatched:
+            release_mailing(mailing_id, claim)
+    return dispatched
 
+
+@shared_task
+def send_scheduled_mailings(engine=None):
+    """
+    Сверщик расписания, вызывается Celery Beat раз в несколько минут.
+    Рассылки запускаются задачами start_mailing с ETA; сверщик ставит
+    такие задачи рассылкам, чей запуск попал в горизонт планирования,
+    и сам запускает рассылки, задача которых потеряна (просрочены больше
+    чем на MAILING_SCHEDULE_GRACE секунд).
+    """
+    with SCHEDULER_TICK_SECONDS.time():
+        for mailing in unscheduled_mailings():
+            schedule_mailing(mailing)
+
+        sent_count = 0
+        for mailing_id in overdue_mailings().values_list('id', flat=True):
+            logger.warning(f"Запуск рассылки {mailing_id} просрочен, запускаем из сверщика.")
+            if run_mailing(mailing_id, engine):
+                sent_count += 1
+
+    SCHEDULER_MAILINGS_TOTAL.inc(sent_count)
     return f"Отправлено {sent_count} рассылок."
 
 
+@shared_task(bind=True)
+def start_mailing(self, mailing_id, engine=None):
+    """
+    Задача Celery, поставленная schedule_mailing на время запуска рассылки
+    (ETA). Выполняется, только если она всё ещё текущая задача рассылки,
+    поэтому отозванная или заменённая задача ничего не отправит. Если запуск
+    перенесли на более позднее время, задача ставится заново.
+    """
+    mailing = Mailing.objects.filter(id=mailing_id, scheduled_task_id=self.request.id).first()
+    if mailing is None:
+        logger.info(f"Задача {self.request.id} рассылки {mailing_id} устарела.")
+        return False
+    if mailing.next_run_at is None or mailing.next_run_at > timezone.now():
+        schedule_mailing(mailing)
+        return False
+    return run_mailing(mailing_id, engine)
+
+
 @shared_task
-def send_single_mailing(mailing_id):
+def send_single_mailing(mailing_id, engine=None):
     """
     Задача Celery для отправки одной рассылки по ID.
     Вызывается из интерфейса.
     """
-    return send_mailing(mailing_id)
\ No newline at end of file
+    return run_mailing(mailing_id, engine)
+
+
+@shared_task
+def send_mailing_chunk(mailing_id, first_id, last_id, engine=None, claim=None):
+    """
+    Задача Celery для отправки рассылки получателям с client_id от first_id
+    до last_id включительно (режим MAILING_FANOUT).
+    Возвращает количество успешных и неуспешных отправок.
+    """
+    mailing = get_sendable_mailing(mailing_id)
+    if mailing is None:
+        return {'success': 0, 'failed': 0}
+
+    where = Q(client_id__gte=first_id, client_id__lte=last_id)
+    success_count, failure_count = deliver(mailing, engine=engine, claim=claim, where=where)
+    return {'success': success_count, 'failed': failure_count}
+
+
+@shared_task
+def send_domain_partition(mailing_id, first, last, domain=None, exclude=(), claim=None):
+    """
+    Задача Celery для отправки части получателей одного домена
+    (режим MAILING_FANOUT_BY_DOMAIN) с границами first, last и исключёнными
+    доменами exclude из partition_recipients. Вся часть уходит через одно
+    переиспользуемое соединение по маршруту домена из MAILING_DOMAIN_ROUTES.
+    domain=None — общая часть небольших доменов через EMAIL_HOST.
+    """
+    mailing = get_sendable_mailing(mailing_id)
+    if mailing is None:
+        return {'success': 0, 'failed': 0}
+
+    success_count, failure_count = deliver(
+        mailing,
+        engine='pool',
+        claim=claim,
+        where=partition_condition(first, last, exclude),
+        size=1,
+        **route_for(domain),
+    )
+    logger.info(
+        f"Рассылка {mailing_id}, домен {domain or '(прочие)'}: "
+        f"успешно {success_count}, ошибок {failure_count}."
+    )
+    return {'success': success_count, 'failed': failure_count}
+
+
+@shared_task
+def finalize_mailing(results, mailing_id):
+    """
+    Завершающая задача chord: суммирует результаты частей рассылки и
+    переносит рассылку на следующий период.
+    """
+    success_count = sum(result['success'] for result in results)
+    failure_count = sum(result['failed'] for result in results)
+
+    mailing = Mailing.objects.filter(id=mailing_id).first()
+    if mailing is not None:
+        complete_run(mailing)
+
+    logger.info(
+        f"Рассылка {mailing_id} завершена. Успешно: {success_count}, Ошибок: {failure_count}"
+    )
+    return {'success': success_count, 'failed': failure_count}
+
+
+@shared_task
+def rollup_attempt_statistics():
+    """
+    Задача Celery для инкрементальной агрегации попыток в почасовую и
+    посуточную статистику. Вызывается по расписанию через Celery Beat.
+    """
+    return f"Учтено попыток: {rollup_attempts()}"
+
+
+@shared_task
+def archive_old_attempts():
+    """
+    Задача Celery для переноса старых попыток в архив по
+    MAILING_ATTEMPT_RETENTION_DAYS. Вызывается по расписанию через Celery Beat.
+    """
+    archived, _ = archive_attempts()
+    return f"Перенесено в архив попыток: {archived}"
+
+
+@shared_task
+def retry_recipient_task(mailing_id, client_id, retries, engine=None):
+    """
+    Задача Celery для повтора отправки одному получателю после временной
+    ошибки. Ставится в очередь с задержкой при записи ошибки.
+    """
+    return retry_recipient(mailing_id, client_id, retries, engine)
+
+
+@shared_task
+def requeue_overdue_retries():
+    """
+    Задача Celery, заново ставящая в очередь повторы, задачи которых
+    потерялись. Вызывается по расписанию через Celery Beat.
+    """
+    overdue = overdue_retries().values_list('mailing_id', 'client_id', 'retries')
+    requeued = 0
+    for mailing_id, client_id, retries in overdue.iterator():
+        retry_recipient_task.delay(mailing_id, client_id, retries)
+        requeued += 1
+    return f"Повторно поставлено в очередь: {requeued}"
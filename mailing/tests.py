@@ -0,0 +1,1254 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import addModuleCleanup, mock
+
+from django.conf import settings
+from django.contrib.admin.sites import site
+from django.core.mail import EmailMessage
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from users.models import User
+
+from . import urls
+from .archive import archive_attempts
+from .exporters import filter_attempts
+from .fake_smtp import FakeSMTPServer
+from .importers import existing_clients, import_clients
+from .metrics import HOSTNAME, REGISTRY, Counter, Histogram, Registry
+from .models import (
+    Client,
+    Delivery,
+    DeliveryRollup,
+    Mailing,
+    MailingAttempt,
+    Message,
+    RollupCheckpoint,
+    Suppression,
+)
+from .ratelimit import RateLimiter, TokenBucket, check_cache_backend
+from .rollups import CHECKPOINT_NAME, rollup_attempts, rollup_batch, timeseries
+from .routing import partition_condition, partition_recipients
+from .services import (
+    ThreadedDeliveryEngine,
+    claim_mailing,
+    complete_run,
+    deliver,
+    due_mailings,
+    overdue_retries,
+    rebuild_counters,
+    release_mailing,
+    renew_claim,
+    retry_recipient,
+    send_mailing,
+)
+from .stats import get_home_stats
+from .suppression import SuppressionFilter
+from .tasks import retry_recipient_task, run_mailing, send_domain_partition, start_mailing
+from .views import MailingAttemptListView
+
+
+def setUpModule():
+    # Метрики тестов пишутся во временный каталог, а не в MAILING_METRICS_DIR
+    # проекта; несохранённые значения отбрасываются до выхода процесса
+    directory = tempfile.TemporaryDirectory()
+    metrics_settings = override_settings(MAILING_METRICS_DIR=directory.name)
+    metrics_settings.enable()
+    addModuleCleanup(directory.cleanup)
+    addModuleCleanup(metrics_settings.disable)
+    addModuleCleanup(REGISTRY.reset)
+
+
+# Бюджет SQL-запросов на GET-запрос к каждому URL приложения, включая
+# загрузку сессии, пользователя и его прав. Число запросов не должно зависеть
+# от количества строк: превышение бюджета означает N+1.
+QUERY_BUDGETS = {
+    "home": 4,
+    "client_list": 3,
+    "client_create": 2,
+    "client_import": 4,
+    "client_detail": 3,
+    "client_update": 3,
+    "client_delete": 3,
+    "message_list": 3,
+    "message_create": 2,
+    "message_detail": 3,
+    "message_update": 3,
+    "message_delete": 3,
+    "mailing_list": 5,
+    "mailing_create": 4,
+    "mailing_detail": 5,
+    "mailing_update": 6,
+    "mailing_delete": 3,
+    "attempt_list": 5,
+    "attempt_export": 5,
+    "statistics": 7,
+    "statistics_timeseries": 5,
+    "send_mailing": 5,
+    "metrics": 2,
+}
+
+
+def smtp_settings(server, **overrides):
+    """
+    Настройки отправки через локальную заглушку SMTP.
+    """
+    return override_settings(
+        EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+        EMAIL_HOST=server.host,
+        EMAIL_PORT=server.port,
+        EMAIL_HOST_USER="",
+        EMAIL_USE_TLS=False,
+        EMAIL_USE_SSL=False,
+        MAILING_DELIVERY_ENGINE="pool",
+        **overrides,
+    )
+
+
+class MailingTestCase(TestCase):
+    """
+    Общая основа тестов приложения: владелец, сообщение и рассылка
+    с полями MAILING_FIELDS. Вызовы брокера Celery (постановка задач
+    запуска и повторов, отзыв задач) подменяются.
+    """
+
+    MAILING_FIELDS = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user("owner")
+        cls.message = Message.objects.create(subject="Тема", body="Текст", owner=cls.user)
+        cls.mailing = cls.create_mailing(**cls.MAILING_FIELDS)
+
+    @staticmethod
+    def create_user(username):
+        return User.objects.create_user(
+            username=username, email=f"{username}@example.com", password="password"
+        )
+
+    @classmethod
+    def create_mailing(cls, **fields):
+        now = timezone.now()
+        fields = {
+            "first_send_time": now - timedelta(hours=1),
+            "end_time": now + timedelta(days=1),
+            "message": cls.message,
+            "owner": cls.user,
+            **fields,
+        }
+        return Mailing.objects.create(**fields)
+
+    @classmethod
+    def create_clients(cls, emails, mailing=None):
+        """
+        Клиенты владельца с адресами emails; если передана рассылка,
+        они добавляются в её получатели.
+        """
+        clients = Client.objects.bulk_create(
+            Client(email=email, full_name=f"Клиент {email.split('@')[0]}", owner=cls.user)
+            for email in emails
+        )
+        if mailing is not None:
+            mailing.clients.add(*clients)
+        return clients
+
+    def setUp(self):
+        self.apply_async = self.patch(start_mailing, "apply_async")
+        self.revoke = self.patch(start_mailing.app.control, "revoke")
+        self.schedule_retry = self.patch(retry_recipient_task, "apply_async")
+        # После отката транзакции теста id списка подавления используются снова
+        SuppressionFilter.clear_cache()
+
+    def patch(self, target, name, **kwargs):
+        patcher = mock.patch.object(target, name, **kwargs)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class QueryBudgetTest(MailingTestCase):
+    """
+    Проверяет количество SQL-запросов каждого URL из mailing/urls.py на
+    заполненных данных.
+    """
+
+    ROWS = 15
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.clients = cls.create_clients(f"client{i}@example.com" for i in range(cls.ROWS))
+        cls.messages = [cls.message] + Message.objects.bulk_create(
+            Message(subject=f"Тема {i}", body="Текст", owner=cls.user) for i in range(1, cls.ROWS)
+        )
+        mailings = [cls.mailing] + [cls.create_mailing(message=message) for message in cls.messages[1:]]
+        for mailing in mailings:
+            mailing.clients.set(cls.clients)
+            MailingAttempt.objects.bulk_create(
+                MailingAttempt(mailing=mailing, status="success", server_response="OK")
+                for _ in range(3)
+            )
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def url_for(self, name):
+        pattern = next(p for p in urls.urlpatterns if p.name == name)
+        kwargs = {}
+        if "pk" in pattern.pattern.converters:
+            kwargs["pk"] = {
+                "client": self.clients[0].pk,
+                "message": self.messages[0].pk,
+                "mailing": self.mailing.pk,
+            }[name.split("_")[0]]
+        if "mailing_id" in pattern.pattern.converters:
+            kwargs["mailing_id"] = self.mailing.pk
+        return reverse(f"mailing:{name}", kwargs=kwargs)
+
+    def test_every_url_has_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(names, set(QUERY_BUDGETS))
+
+    def test_query_budgets(self):
+        for name, budget in QUERY_BUDGETS.items():
+            with self.subTest(url=name):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(self.url_for(name))
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(
+                    len(queries),
+                    budget,
+                    f"{name}: {len(queries)} запросов при бюджете {budget}\n"
+                    + "\n".join(query["sql"] for query in queries.captured_queries),
+                )
+
+
+class IndexUsageTest(MailingTestCase):
+    """
+    Проверяет по EXPLAIN, что критичные запросы планировщика и попыток
+    используют свои индексы. На PostgreSQL последовательное сканирование
+    отключается: на маленьких тестовых таблицах оно дешевле любого индекса.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        MailingAttempt.objects.bulk_create(
+            MailingAttempt(mailing=cls.mailing, status="success", server_response="OK")
+            for _ in range(10)
+        )
+
+    def setUp(self):
+        super().setUp()
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f"{index_name} не используется:\n{plan}")
+
+    def test_due_mailings(self):
+        self.assertUsesIndex(due_mailings(), "mailing_due_idx")
+
+    def test_mailing_attempts_by_time(self):
+        attempts = MailingAttempt.objects.filter(mailing=self.mailing).order_by(
+            "-attempt_time", "-id"
+        )
+        self.assertUsesIndex(attempts[:50], "attempt_mailing_time_idx")
+
+    def test_mailing_attempts_by_status(self):
+        attempts = filter_attempts(
+            mailing_id=self.mailing.id,
+            status="failed",
+            since=timezone.now() - timedelta(days=1),
+        )
+        self.assertUsesIndex(attempts, "attempt_mailing_status_idx")
+
+    def test_all_attempts_by_time(self):
+        attempts = MailingAttempt.objects.order_by("-attempt_time", "-id")
+        self.assertUsesIndex(attempts[:50], "attempt_time_idx")
+
+    def test_attempts_in_period(self):
+        now = timezone.now()
+        attempts = filter_attempts(since=now - timedelta(days=1), until=now)
+        self.assertUsesIndex(attempts, "attempt_time_idx")
+
+    def test_existing_clients_case_insensitive(self):
+        clients = existing_clients(["a@x.example", "b@x.example"]).values_list("email_lower")
+        self.assertUsesIndex(clients, "client_email_lower_idx")
+
+
+class DomainPartitionTest(MailingTestCase):
+    """
+    Проверяет разбиение получателей по доменам и отправку каждой части
+    через одно соединение по маршруту домена на заглушках SMTP.
+    """
+
+    DOMAINS = {"big.example": 5, "mid.example": 4, "a.example": 3, "b.example": 2}
+    MAILING_FIELDS = {"status": "running"}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_clients(
+            (
+                f"client{i}@{domain.upper()}"
+                for domain, count in cls.DOMAINS.items()
+                for i in range(count)
+            ),
+            cls.mailing,
+        )
+
+    def test_partitions_by_domain(self):
+        with override_settings(
+            MAILING_DOMAIN_ROUTES={"b.example": {}}, MAILING_DOMAIN_PARTITION_MIN_SIZE=4
+        ):
+            partitions = list(partition_recipients(self.mailing, chunk_size=4))
+        self.assertEqual(
+            [(part.domain, part.size) for part in partitions],
+            [("b.example", 2), ("big.example", 4), ("big.example", 1), ("mid.example", 4), (None, 3)],
+        )
+        # Общая часть a.example охватывает отдельные части следующих доменов
+        self.assertEqual(partitions[-1].exclude, ["b.example", "big.example", "mid.example"])
+
+        rows = Mailing.clients.through.objects.filter(mailing=self.mailing)
+        selected = [
+            set(
+                rows.filter(partition_condition(part.first, part.last, part.exclude))
+                .values_list("client_id", flat=True)
+            )
+            for part in partitions
+        ]
+        self.assertEqual([len(client_ids) for client_ids in selected], [2, 4, 1, 4, 3])
+        self.assertEqual(set().union(*selected), set(rows.values_list("client_id", flat=True)))
+
+    def test_mixed_partition_split_at_chunk_size(self):
+        with override_settings(MAILING_DOMAIN_PARTITION_MIN_SIZE=6):
+            partitions = list(partition_recipients(self.mailing, chunk_size=6))
+        self.assertEqual([(part.domain, part.size) for part in partitions], [(None, 6), (None, 6), (None, 2)])
+        rows = Mailing.clients.through.objects.filter(mailing=self.mailing)
+        counts = [rows.filter(partition_condition(part.first, part.last)).count() for part in partitions]
+        self.assertEqual(counts, [6, 6, 2])
+
+    def test_partition_uses_one_connection_per_route(self):
+        with FakeSMTPServer() as relay, FakeSMTPServer() as route, smtp_settings(
+            relay,
+            MAILING_DOMAIN_ROUTES={"big.example": {"host": route.host, "port": route.port}},
+            MAILING_DOMAIN_PARTITION_MIN_SIZE=4,
+            MAILING_FANOUT_CHUNK_SIZE=100,
+        ):
+            results = [
+                send_domain_partition(self.mailing.id, part.first, part.last, part.domain, part.exclude)
+                for part in partition_recipients(self.mailing)
+            ]
+
+        self.assertEqual(sum(result["success"] for result in results), 14)
+        self.assertEqual(route.messages_per_connection, [5])
+        self.assertEqual(relay.messages_per_connection, [4, 5])
+
+
+class ETASchedulingTest(MailingTestCase):
+    """
+    Проверяет постановку задачи запуска с ETA из форм рассылки и отказ
+    устаревших задач. Брокер подменяется: проверяются вызовы apply_async и revoke.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        (cls.recipient,) = cls.create_clients(["client@example.com"])
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def post_form(self, url, first_send_time):
+        data = {
+            "first_send_time": first_send_time.strftime("%Y-%m-%dT%H:%M"),
+            "end_time": (first_send_time + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M"),
+            "periodicity": "daily",
+            "message": self.message.pk,
+            "clients": [self.recipient.pk],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302)
+
+    def test_create_and_update_schedule_eta(self):
+        first_send_time = (timezone.now() + timedelta(minutes=10)).replace(second=0, microsecond=0)
+        self.post_form(reverse("mailing:mailing_create"), first_send_time)
+        mailing = Mailing.objects.latest("id")
+        self.assertTrue(mailing.scheduled_task_id)
+        self.apply_async.assert_called_once_with(
+            (mailing.id,), eta=first_send_time, task_id=mailing.scheduled_task_id
+        )
+
+        previous = mailing.scheduled_task_id
+        self.post_form(
+            reverse("mailing:mailing_update", kwargs={"pk": mailing.pk}),
+            first_send_time + timedelta(minutes=5),
+        )
+        mailing.refresh_from_db()
+        self.assertNotEqual(mailing.scheduled_task_id, previous)
+        self.revoke.assert_called_once_with(previous)
+        self.assertEqual(self.apply_async.call_args.kwargs["eta"], mailing.next_run_at)
+
+    def test_far_mailing_left_to_reconciler(self):
+        self.post_form(reverse("mailing:mailing_create"), timezone.now() + timedelta(days=2))
+        self.assertEqual(Mailing.objects.latest("id").scheduled_task_id, "")
+        self.apply_async.assert_not_called()
+
+    def test_stale_task_does_nothing(self):
+        mailing = self.create_mailing(scheduled_task_id="current")
+        self.assertFalse(start_mailing.apply((mailing.id,), task_id="revoked").get())
+        mailing.refresh_from_db()
+        self.assertEqual(mailing.status, "created")
+        self.assertIsNone(mailing.claimed_until)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class ClientImportTest(MailingTestCase):
+    """
+    Проверяет импорт клиентов из CSV: дубликаты без учёта регистра, подсчёт
+    добавленных в рассылку и сброс счётчиков главной страницы.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_clients(["John@X.example"], cls.mailing)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def import_csv(self, text):
+        with self.captureOnCommitCallbacks(execute=True):
+            return import_clients(io.StringIO(text), self.user, self.mailing, chunk_size=2)
+
+    def test_existing_email_matched_case_insensitively(self):
+        result = self.import_csv("email,full_name\njohn@x.example,John\nNEW@x.example,New\nnew@x.example,\nbad,\n")
+        self.assertEqual((result.inserted, result.duplicates, result.invalid), (1, 2, 1))
+        self.assertEqual(
+            sorted(Client.objects.values_list("email", flat=True)), ["John@X.example", "new@x.example"]
+        )
+        # Клиент John уже был в рассылке: добавлен только новый
+        self.assertEqual(result.attached, 1)
+        self.assertEqual(self.mailing.clients.count(), 2)
+
+    def test_import_invalidates_home_stats(self):
+        self.assertEqual(get_home_stats()["unique_clients"], 1)
+        self.import_csv("email\nfirst@x.example\nsecond@x.example\n")
+        self.assertEqual(get_home_stats()["unique_clients"], 3)
+
+
+class RetryTest(MailingTestCase):
+    """
+    Проверяет повторы после временных ошибок на заглушке SMTP: 4xx ведёт к
+    повтору, 5xx — к окончательной ошибке, число повторов ограничено,
+    дубли и устаревшие задачи повтора ничего не отправляют. Брокер
+    подменяется, время повтора наступает сдвигом next_retry_at.
+    """
+
+    MAILING_FIELDS = {"periodicity": "daily", "status": "running"}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.clients = cls.create_clients(
+            (f"client{i}@retry.example" for i in range(3)), cls.mailing
+        )
+        cls.deferred = cls.clients[1]
+
+    def setUp(self):
+        super().setUp()
+        self.server = FakeSMTPServer(defer=[self.deferred.email]).start()
+        self.addCleanup(self.server.stop)
+
+    def send(self):
+        with smtp_settings(self.server), self.captureOnCommitCallbacks(execute=True):
+            send_mailing(self.mailing.id)
+
+    def retry(self, retries, **overrides):
+        with smtp_settings(self.server, **overrides), self.captureOnCommitCallbacks(execute=True):
+            return retry_recipient(self.mailing.id, self.deferred.id, retries)
+
+    def delivery(self):
+        return Delivery.objects.get(mailing=self.mailing, client=self.deferred)
+
+    def make_due(self):
+        Delivery.objects.filter(client=self.deferred).update(next_retry_at=timezone.now())
+
+    def test_transient_error_retried_until_delivered(self):
+        self.send()
+        delivery = self.delivery()
+        self.assertEqual((delivery.state, delivery.retries), ("retrying", 0))
+        self.assertIsNotNone(delivery.next_retry_at)
+        self.schedule_retry.assert_called_once()
+        self.assertEqual(self.schedule_retry.call_args.args[0], (self.mailing.id, self.deferred.id, 0))
+
+        self.server.defer.clear()
+        self.make_due()
+        self.assertTrue(self.retry(0))
+        delivery = self.delivery()
+        self.assertEqual((delivery.state, delivery.retries), ("delivered", 1))
+        self.assertEqual(self.server.message_count, 3)
+        self.mailing.refresh_from_db()
+        self.assertEqual((self.mailing.successful_attempts, self.mailing.failed_attempts), (3, 1))
+
+    def test_permanent_error_not_retried(self):
+        self.server.defer.clear()
+        self.server.reject.add(self.deferred.email)
+        self.send()
+        self.assertEqual(self.delivery().state, "failed")
+        self.schedule_retry.assert_not_called()
+
+    def test_retries_capped(self):
+        with override_settings(MAILING_RETRY_MAX_ATTEMPTS=1):
+            self.send()
+            self.make_due()
+            self.assertFalse(self.retry(0))
+        delivery = self.delivery()
+        self.assertEqual((delivery.state, delivery.retries), ("failed", 1))
+        self.assertIsNone(delivery.next_retry_at)
+        self.assertEqual(self.schedule_retry.call_count, 1)
+
+    def test_duplicate_and_stale_retries_do_nothing(self):
+        self.send()
+        self.server.defer.clear()
+        # Время повтора ещё не наступило
+        self.assertFalse(self.retry(0))
+        self.make_due()
+        self.assertFalse(self.retry(3))
+        self.assertTrue(self.retry(0))
+        self.assertFalse(self.retry(0))
+        self.assertEqual(self.server.message_count, 3)
+
+    def test_claimed_retry_requeued_after_worker_failure(self):
+        self.send()
+        self.make_due()
+        with mock.patch("mailing.services.compile_message", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.retry(0)
+
+        delivery = self.delivery()
+        self.assertEqual(delivery.state, "retrying")
+        self.assertGreater(delivery.next_retry_at, timezone.now())
+        # Пока аренда не истекла, дубль задачи ничего не делает
+        self.assertFalse(self.retry(0))
+        later = timezone.now() + timedelta(seconds=2 * settings.MAILING_RETRY_GRACE + 1)
+        self.assertIn(delivery, overdue_retries(later))
+
+    def test_retry_cancelled_when_mailing_stopped_or_expired(self):
+        self.send()
+        self.server.defer.clear()
+        later = timezone.now() + timedelta(seconds=2 * settings.MAILING_RETRY_GRACE + 1)
+        for fields in ({"status": "stopped"}, {"end_time": timezone.now() - timedelta(minutes=1)}):
+            with self.subTest(**fields):
+                Delivery.objects.filter(client=self.deferred).update(state="retrying")
+                Mailing.objects.filter(id=self.mailing.id).update(**fields)
+                self.assertNotIn(self.delivery(), overdue_retries(later))
+                self.make_due()
+                self.assertFalse(self.retry(0))
+                delivery = self.delivery()
+                self.assertEqual(delivery.state, "failed")
+                self.assertIsNone(delivery.next_retry_at)
+                Mailing.objects.filter(id=self.mailing.id).update(
+                    status="running", end_time=self.mailing.end_time
+                )
+        self.assertEqual(self.server.message_count, 2)
+
+    def test_late_retry_not_skipped_in_next_run(self):
+        self.send()
+        self.assertEqual(self.server.message_count, 2)
+
+        # Повтор выполняется после завершения запуска
+        self.server.defer.clear()
+        self.make_due()
+        self.assertTrue(self.retry(0))
+        self.assertEqual(self.server.message_count, 3)
+
+        self.send()
+        self.assertEqual(self.server.message_count, 6)
+
+
+class SuppressionTest(MailingTestCase):
+    """
+    Проверяет список подавления: общие записи и записи владельца, отсев
+    подавленных получателей при отправке и добавление жёстких отказов
+    в общий список.
+    """
+
+    MAILING_FIELDS = {"status": "running"}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = cls.create_user("other")
+        # unsubscribed — в общем списке, complained — в списке владельца,
+        # foreign — только в списке другого владельца, bounced — отклоняется сервером
+        names = ("unsubscribed", "complained", "foreign", "bounced", "fine")
+        clients = cls.create_clients((f"{name.title()}@X.example" for name in names), cls.mailing)
+        cls.clients = dict(zip(names, clients))
+        Suppression.objects.create(email="unsubscribed@x.example", reason="unsubscribe")
+        Suppression.objects.create(email=" Complained@X.example", owner=cls.user, reason="complaint")
+        Suppression.objects.create(email="foreign@x.example", owner=cls.other)
+
+    def test_filter_scope(self):
+        suppression = SuppressionFilter.load(self.user.id)
+        self.assertEqual(len(suppression), 2)
+        self.assertEqual(
+            suppression.suppressed(list(self.clients.values())),
+            {
+                self.clients["unsubscribed"].id: "unsubscribe",
+                self.clients["complained"].id: "complaint",
+            },
+        )
+        self.assertFalse(suppression.might_contain(self.clients["foreign"].email))
+
+    def test_filter_loaded_once_until_list_changes(self):
+        suppression = SuppressionFilter.for_owner(self.user.id)
+        with self.assertNumQueries(1):
+            self.assertIs(SuppressionFilter.for_owner(self.user.id), suppression)
+
+        Suppression.objects.filter(email="unsubscribed@x.example").delete()
+        self.assertIs(SuppressionFilter.for_owner(self.user.id), suppression)
+        self.assertEqual(suppression.suppressed([self.clients["unsubscribed"]]), {})
+
+        Suppression.objects.create(email="fine@x.example", owner=self.user)
+        reloaded = SuppressionFilter.for_owner(self.user.id)
+        self.assertIsNot(reloaded, suppression)
+        self.assertTrue(reloaded.might_contain(self.clients["fine"].email))
+
+    def test_send_skips_suppressed_and_suppresses_hard_bounce(self):
+        with FakeSMTPServer(reject=[self.clients["bounced"].email]) as server, smtp_settings(server):
+            send_mailing(self.mailing.id)
+
+        self.assertEqual(server.message_count, 2)
+        statuses = sorted(MailingAttempt.objects.values_list("status", flat=True))
+        self.assertEqual(statuses, ["failed", "success", "success", "suppressed", "suppressed"])
+        self.mailing.refresh_from_db()
+        self.assertEqual(
+            (
+                self.mailing.total_attempts,
+                self.mailing.successful_attempts,
+                self.mailing.failed_attempts,
+            ),
+            (3, 2, 1),
+        )
+        self.assertFalse(
+            Delivery.objects.filter(
+                client__in=[self.clients["unsubscribed"], self.clients["complained"]]
+            ).exists()
+        )
+        self.assertTrue(
+            Suppression.objects.filter(
+                email="bounced@x.example", owner__isnull=True, reason="bounce"
+            ).exists()
+        )
+
+    def test_admin_form_normalizes_before_unique_check(self):
+        admin = site._registry[Suppression]
+        request = RequestFactory().get("/")
+        request.user = self.user
+        form_class = admin.get_form(request)
+        for email, owner in (("Unsubscribed@X.example", ""), (" COMPLAINED@x.example", self.user.id)):
+            with self.subTest(email=email):
+                form = form_class(data={"email": email, "owner": owner, "reason": "manual"})
+                self.assertFalse(form.is_valid())
+        form = form_class(data={"email": "New@X.example", "owner": "", "reason": "manual"})
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.save().email, "new@x.example")
+
+
+class FakeClock:
+    """
+    Подменяет time.time и time.sleep: sleep только сдвигает время.
+    """
+
+    def __init__(self, now):
+        self.now = now
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class RateLimitTest(SimpleTestCase):
+    """
+    Проверяет вёдра токенов на локальном кеше с подменёнными часами:
+    ёмкость окна, пополнение в следующем окне и совместную работу лимитов
+    релея и домена.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.clock = FakeClock(1000.0)
+        patcher = mock.patch.multiple("mailing.ratelimit.time", time=self.clock.time, sleep=self.clock.sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_capacity_and_window_refill(self):
+        bucket = TokenBucket("test", rate=120)
+        self.assertEqual((bucket.capacity, bucket.window), (2, 1.0))
+        self.assertEqual([bucket.try_acquire(1000.25) for _ in range(2)], [0, 0])
+        self.assertEqual(bucket.try_acquire(1000.25), 0.75)
+        self.assertEqual(bucket.wait_time(1000.5), 0.5)
+        self.assertEqual(bucket.try_acquire(1001.0), 0)
+
+    def test_acquire_waits_for_next_window(self):
+        bucket = TokenBucket("test", rate=60)
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(self.clock.slept, [1.0, 1.0])
+
+    def test_domain_wait_does_not_spend_relay_tokens(self):
+        limiter = RateLimiter("relay", relay_rate=180, domain_rates={"slow.example": 60})
+        relay = limiter.relay_bucket
+        self.assertEqual((relay.capacity, relay.window), (3, 1.0))
+
+        limiter.acquire("a@slow.example")
+        limiter.acquire("b@SLOW.example")
+        self.assertEqual(self.clock.slept, [1.0])
+        self.assertEqual(cache.get(relay.key(1000.0)), 1)
+        self.assertEqual(cache.get(relay.key(1001.0)), 1)
+
+        # Другие домены ограничены только релеем
+        limiter.acquire("c@fast.example")
+        limiter.acquire("d@fast.example")
+        self.assertEqual(self.clock.slept, [1.0])
+        limiter.acquire("e@fast.example")
+        self.assertEqual(self.clock.slept, [1.0, 1.0])
+
+    def test_tokens_released_when_lost_race(self):
+        limiter = RateLimiter("relay", relay_rate=180, domain_rates={"slow.example": 60})
+        domain = limiter.domain_bucket("slow.example")
+        with mock.patch.object(domain, "wait_time", return_value=0):
+            limiter.acquire("a@slow.example")
+            self.assertEqual(limiter.try_acquire([limiter.relay_bucket, domain], 1000.0), 1.0)
+        self.assertEqual(cache.get(limiter.relay_bucket.key(1000.0)), 1)
+
+    def test_non_atomic_cache_reported(self):
+        check_cache_backend.cache_clear()
+        with self.settings(MAILING_RATE_LIMIT_RELAY=60), self.assertLogs("mailing.ratelimit", "ERROR"):
+            RateLimiter.from_settings()
+
+
+class MetricsTest(SimpleTestCase):
+    """
+    Проверяет текстовый формат метрик и перенос файлов завершившихся
+    процессов в файл собирающего процесса.
+    """
+
+    def setUp(self):
+        self.registry = Registry()
+        self.emails = Counter("test_emails_total", "Письма", registry=self.registry)
+        self.seconds = Histogram("test_seconds", "Длительность", buckets=(0.1, 1), registry=self.registry)
+        self.directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(MAILING_METRICS_DIR=str(self.directory)))
+
+    def write_samples(self, file_id, samples):
+        (self.directory / f"{file_id}.json").write_text(json.dumps(samples))
+
+    def test_render(self):
+        self.emails.inc(result="success")
+        self.emails.inc(2, result="success")
+        self.emails.inc(result="failure")
+        for value in (0.05, 0.5, 5):
+            self.seconds.observe(value, phase="smtp")
+        self.assertEqual(
+            self.registry.render(),
+            "# HELP test_emails_total Письма\n"
+            "# TYPE test_emails_total counter\n"
+            'test_emails_total{result="failure"} 1\n'
+            'test_emails_total{result="success"} 3\n'
+            "# HELP test_seconds Длительность\n"
+            "# TYPE test_seconds histogram\n"
+            'test_seconds_bucket{phase="smtp",le="0.1"} 1\n'
+            'test_seconds_bucket{phase="smtp",le="1"} 2\n'
+            'test_seconds_bucket{phase="smtp",le="+Inf"} 3\n'
+            'test_seconds_sum{phase="smtp"} 5.55\n'
+            'test_seconds_count{phase="smtp"} 3\n',
+        )
+
+    def test_dead_process_files_absorbed(self):
+        self.emails.inc(result="success")
+        self.write_samples(f"{HOSTNAME}-999999-dead", [["test_emails_total", {"result": "success"}, [2]]])
+        self.write_samples(f"{HOSTNAME}-999998-live", [["test_emails_total", {"result": "success"}, [4]]])
+        self.write_samples("other.host-999999-dead", [["test_emails_total", {"result": "success"}, [8]]])
+
+        with mock.patch("mailing.metrics.process_alive", side_effect=lambda pid: pid != 999999):
+            for _ in range(2):
+                totals = self.registry.collect()
+                self.assertEqual(totals[("test_emails_total", (("result", "success"),))], [15])
+
+        # Остались файлы живого процесса, другого хоста и собирающего процесса
+        files = {path.name for path in self.directory.iterdir()}
+        (own,) = files - {f"{HOSTNAME}-999998-live.json", "other.host-999999-dead.json"}
+        self.assertTrue(own.startswith(f"{HOSTNAME}-{os.getpid()}-"))
+
+
+class ArchiveTest(MailingTestCase):
+    """
+    Проверяет перенос старых попыток в архив: переносятся только попытки
+    старше срока хранения и не новее отметки агрегации, архив содержит
+    ровно удалённые строки, а счётчики рассылки не меняются.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        now = timezone.now()
+        # Порядок id: старая, недавняя, две старые — до отметки агрегации,
+        # последняя старая — после неё
+        attempts = [
+            ("success", now - timedelta(days=40)),
+            ("success", now - timedelta(days=1)),
+            ("failed", now - timedelta(days=40)),
+            ("success", now - timedelta(days=35)),
+            ("failed", now - timedelta(days=40)),
+        ]
+        cls.attempt_ids = []
+        for status, attempt_time in attempts:
+            attempt = MailingAttempt.objects.create(mailing=cls.mailing, status=status, server_response="OK")
+            MailingAttempt.objects.filter(id=attempt.id).update(attempt_time=attempt_time)
+            cls.attempt_ids.append(attempt.id)
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(
+            override_settings(
+                MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory()),
+                MAILING_ARCHIVE_BATCH_SIZE=2,
+                MAILING_ARCHIVE_BATCH_PAUSE=0,
+            )
+        )
+        rollup_batch(4)
+        # Архив не догоняет агрегацию, чтобы последняя попытка осталась после отметки
+        self.enterContext(mock.patch("mailing.archive.rollup_attempts"))
+
+    def counters(self):
+        rebuild_counters()
+        self.mailing.refresh_from_db()
+        return (self.mailing.total_attempts, self.mailing.successful_attempts, self.mailing.failed_attempts)
+
+    def test_archives_settled_attempts_past_retention(self):
+        checkpoint = RollupCheckpoint.objects.get(name=CHECKPOINT_NAME).last_attempt_id
+        self.assertEqual(checkpoint, self.attempt_ids[3])
+        counters = self.counters()
+        self.assertEqual(counters, (5, 3, 2))
+
+        archived, path = archive_attempts(retention_days=30)
+
+        old_settled = [self.attempt_ids[0], self.attempt_ids[2], self.attempt_ids[3]]
+        self.assertEqual(archived, 3)
+        self.assertEqual(
+            sorted(MailingAttempt.objects.values_list("id", flat=True)),
+            [self.attempt_ids[1], self.attempt_ids[4]],
+        )
+        with gzip.open(path, "rt", encoding="utf-8") as stream:
+            rows = [json.loads(line) for line in stream]
+        self.assertEqual([row["id"] for row in rows], old_settled)
+        self.assertEqual([row["status"] for row in rows], ["success", "failed", "success"])
+        self.assertEqual({row["mailing_id"] for row in rows}, {self.mailing.id})
+        self.assertEqual(self.counters(), counters)
+
+    def test_zero_retention_keeps_everything(self):
+        with override_settings(MAILING_ATTEMPT_RETENTION_DAYS=30):
+            self.assertEqual(archive_attempts(retention_days=0), (0, None))
+        with override_settings(MAILING_ATTEMPT_RETENTION_DAYS=0):
+            self.assertEqual(archive_attempts(), (0, None))
+        self.assertEqual(MailingAttempt.objects.count(), 5)
+
+
+class ScheduleTest(MailingTestCase):
+    """
+    Проверяет расписание рассылок: вычисление следующего запуска,
+    завершение запуска и полное сохранение, не затирающее поля, которые
+    меняются в обход формы.
+    """
+
+    MAILING_FIELDS = {"status": "running"}
+
+    def schedule(self, periodicity, first_send_time, last_sent_at, end_time=None):
+        return Mailing(
+            periodicity=periodicity,
+            first_send_time=first_send_time,
+            last_sent_at=last_sent_at,
+            end_time=end_time or first_send_time + timedelta(days=365),
+            status="running",
+        )
+
+    def test_monthly_runs_clamped_to_month_end(self):
+        first = datetime(2026, 1, 31, 10, tzinfo=dt_timezone.utc)
+        runs = [first]
+        for _ in range(2):
+            runs.append(self.schedule("monthly", first, runs[-1] + timedelta(minutes=5)).compute_next_run())
+        self.assertEqual(
+            runs,
+            [
+                first,
+                datetime(2026, 2, 28, 10, tzinfo=dt_timezone.utc),
+                datetime(2026, 3, 31, 10, tzinfo=dt_timezone.utc),
+            ],
+        )
+
+    def test_missed_periods_skipped_after_downtime(self):
+        first = datetime(2026, 3, 1, 9, tzinfo=dt_timezone.utc)
+        mailing = self.schedule("daily", first, datetime(2026, 3, 5, 14, tzinfo=dt_timezone.utc))
+        self.assertEqual(mailing.compute_next_run(), datetime(2026, 3, 6, 9, tzinfo=dt_timezone.utc))
+
+        # Рассылка простояла десять дней: следующий запуск — ближайший будущий период
+        mailing = self.create_mailing(
+            periodicity="daily",
+            status="running",
+            first_send_time=timezone.now() - timedelta(days=10, hours=1),
+            end_time=timezone.now() + timedelta(days=30),
+        )
+        complete_run(mailing)
+        mailing.refresh_from_db()
+        self.assertEqual(mailing.next_run_at, mailing.first_send_time + timedelta(days=11))
+        self.assertEqual((mailing.status, mailing.run_number), ("running", 1))
+
+    def test_no_run_after_end_time(self):
+        first = datetime(2026, 3, 1, 9, tzinfo=dt_timezone.utc)
+        mailing = self.schedule("weekly", first, first + timedelta(days=8), end_time=first + timedelta(days=14))
+        self.assertEqual(mailing.compute_next_run(), first + timedelta(days=14))
+        mailing.end_time -= timedelta(seconds=1)
+        self.assertIsNone(mailing.compute_next_run())
+
+        mailing = self.create_mailing(periodicity="weekly", status="running")
+        complete_run(mailing)
+        mailing.refresh_from_db()
+        self.assertEqual((mailing.status, mailing.next_run_at), ("completed", None))
+
+    def test_once_completed_after_run(self):
+        self.assertEqual(self.mailing.next_run_at, self.mailing.first_send_time)
+        complete_run(self.mailing)
+        self.mailing.refresh_from_db()
+        self.assertEqual((self.mailing.status, self.mailing.next_run_at), ("completed", None))
+        self.assertEqual(self.mailing.run_number, 1)
+        self.assertIsNotNone(self.mailing.last_sent_at)
+        self.apply_async.assert_not_called()
+
+    def test_full_save_keeps_fields_changed_elsewhere(self):
+        stale = Mailing.objects.get(id=self.mailing.id)
+        Mailing.objects.filter(id=self.mailing.id).update(
+            total_attempts=5,
+            successful_attempts=4,
+            failed_attempts=1,
+            scheduled_task_id="task",
+            run_number=3,
+            claim_token="token",
+        )
+        stale.periodicity = "daily"
+        stale.save()
+
+        self.mailing.refresh_from_db()
+        self.assertEqual(self.mailing.periodicity, "daily")
+        self.assertEqual(
+            (
+                self.mailing.total_attempts,
+                self.mailing.successful_attempts,
+                self.mailing.failed_attempts,
+                self.mailing.scheduled_task_id,
+                self.mailing.run_number,
+                self.mailing.claim_token,
+            ),
+            (5, 4, 1, "task", 3, "token"),
+        )
+
+
+class RollupTest(MailingTestCase):
+    """
+    Проверяет инкрементальную агрегацию попыток: прибавление к существующим
+    корзинам, задержку MAILING_ROLLUP_LAG, продвижение отметки и выборку
+    ряда по владельцу.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other = cls.create_user("other")
+        cls.hour = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+
+    def attempt(self, status, minutes=0, mailing=None, attempt_time=None):
+        attempt = MailingAttempt.objects.create(mailing=mailing or self.mailing, status=status)
+        attempt_time = attempt_time or self.hour + timedelta(minutes=minutes)
+        MailingAttempt.objects.filter(id=attempt.id).update(attempt_time=attempt_time)
+        return attempt
+
+    def checkpoint(self):
+        return RollupCheckpoint.objects.get(name=CHECKPOINT_NAME).last_attempt_id
+
+    def buckets(self, period):
+        return list(
+            DeliveryRollup.objects.filter(period=period)
+            .order_by("bucket_start")
+            .values_list("bucket_start", "successful", "failed")
+        )
+
+    def test_batches_merge_into_existing_buckets(self):
+        attempts = [self.attempt("success", 5), self.attempt("failed", 10), self.attempt("success", 70)]
+        self.assertEqual(rollup_batch(2), 2)
+        self.assertEqual(self.checkpoint(), attempts[1].id)
+        self.assertEqual(self.buckets("hour"), [(self.hour, 1, 1)])
+
+        attempts.append(self.attempt("success", 15))
+        self.assertEqual(rollup_attempts(batch_size=2), 2)
+        self.assertEqual(self.checkpoint(), attempts[-1].id)
+        self.assertEqual(
+            self.buckets("hour"),
+            [(self.hour, 2, 1), (self.hour + timedelta(hours=1), 1, 0)],
+        )
+        self.assertEqual(sum(successful for _, successful, _ in self.buckets("day")), 3)
+        self.assertEqual(rollup_batch(2), 0)
+
+    def test_recent_attempts_held_back(self):
+        settled = self.attempt("success", attempt_time=timezone.now() - timedelta(minutes=5))
+        recent = self.attempt("failed", attempt_time=timezone.now())
+        with override_settings(MAILING_ROLLUP_LAG=60):
+            self.assertEqual(rollup_attempts(), 1)
+            self.assertEqual(self.checkpoint(), settled.id)
+        with override_settings(MAILING_ROLLUP_LAG=0):
+            self.assertEqual(rollup_attempts(), 1)
+            self.assertEqual(self.checkpoint(), recent.id)
+        self.assertEqual(sum(failed for _, _, failed in self.buckets("hour")), 1)
+
+    def test_timeseries_scoped_to_owner(self):
+        other_message = Message.objects.create(subject="Тема", body="Текст", owner=self.other)
+        other_mailing = self.create_mailing(message=other_message, owner=self.other)
+        self.attempt("success", 5)
+        self.attempt("failed", 5, mailing=other_mailing)
+        self.attempt("failed", 6, mailing=other_mailing)
+        rollup_attempts()
+
+        since = self.hour - timedelta(hours=1)
+        self.assertEqual(
+            timeseries("hour", since, owner=self.user),
+            [{"bucket_start": self.hour, "successful": 1, "failed": 0}],
+        )
+        self.assertEqual(
+            timeseries("hour", since, owner=self.other),
+            [{"bucket_start": self.hour, "successful": 0, "failed": 2}],
+        )
+        self.assertEqual(
+            timeseries("hour", since),
+            [{"bucket_start": self.hour, "successful": 1, "failed": 2}],
+        )
+
+
+class KeysetPaginationTest(MailingTestCase):
+    """
+    Проверяет keyset-пагинацию журнала попыток: попытки с одинаковым
+    временем не теряются и не повторяются, курсоры ?after и ?before
+    возвращают соседние страницы, некорректный курсор — первую.
+    """
+
+    PAGE_SIZE = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        now = timezone.now()
+        # По две-три попытки на одно время: порядок внутри задаёт id,
+        # граница первой страницы проходит внутри группы
+        times = [now, now - timedelta(minutes=1), now, now - timedelta(minutes=2), now, now - timedelta(minutes=1)]
+        for attempt_time in [*times, now - timedelta(minutes=2)]:
+            attempt = MailingAttempt.objects.create(mailing=cls.mailing, status="success")
+            MailingAttempt.objects.filter(id=attempt.id).update(attempt_time=attempt_time)
+        cls.ordered = list(MailingAttempt.objects.order_by("-attempt_time", "-id").values_list("id", flat=True))
+
+    def page(self, **params):
+        view = MailingAttemptListView()
+        view.request = RequestFactory().get("/", params)
+        _, page, _, is_paginated = view.paginate_queryset(MailingAttempt.objects.all(), self.PAGE_SIZE)
+        self.assertTrue(is_paginated)
+        return page
+
+    def ids(self, page):
+        return [attempt.id for attempt in page]
+
+    def test_forward_pages_cover_ties_once(self):
+        pages = [self.page()]
+        while pages[-1].has_next:
+            pages.append(self.page(after=pages[-1].next_cursor))
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual([attempt_id for page in pages for attempt_id in self.ids(page)], self.ordered)
+        self.assertEqual((pages[0].has_previous, pages[0].has_next), (False, True))
+        self.assertEqual((pages[1].has_previous, pages[1].has_next), (True, True))
+        self.assertEqual((pages[-1].has_previous, pages[-1].has_next), (True, False))
+
+    def test_before_returns_previous_page(self):
+        first = self.page()
+        second = self.page(after=first.next_cursor)
+        last = self.page(after=second.next_cursor)
+
+        back = self.page(before=last.previous_cursor)
+        self.assertEqual(self.ids(back), self.ids(second))
+        self.assertEqual((back.has_previous, back.has_next), (True, True))
+
+        back = self.page(before=back.previous_cursor)
+        self.assertEqual(self.ids(back), self.ids(first))
+        self.assertEqual((back.has_previous, back.has_next), (False, True))
+        self.assertEqual(self.ids(self.page(after=back.next_cursor)), self.ids(second))
+
+    def test_malformed_cursor_falls_back_to_first_page(self):
+        first = self.ids(self.page())
+        for cursor in ("garbage", "e30", "WyJ4Il0", "WyJ4IiwgMV0"):
+            with self.subTest(cursor=cursor):
+                page = self.page(after=cursor)
+                self.assertEqual(self.ids(page), first)
+                self.assertFalse(page.has_previous)
+
+
+class ClaimTest(MailingTestCase):
+    """
+    Проверяет аренду рассылки при конкуренции воркеров: захватывает один,
+    а воркер, чью истёкшую аренду перехватили, не продлевает и не снимает
+    чужой захват.
+    """
+
+    MAILING_FIELDS = {"status": "running"}
+
+    def claimed_until(self):
+        return Mailing.objects.values_list("claimed_until", flat=True).get(id=self.mailing.id)
+
+    def expire_lease(self):
+        Mailing.objects.filter(id=self.mailing.id).update(claimed_until=timezone.now() - timedelta(seconds=1))
+
+    def test_only_current_holder_renews_and_releases(self):
+        first = claim_mailing(self.mailing.id)
+        self.assertIsNotNone(first)
+        self.assertIsNone(claim_mailing(self.mailing.id))
+        self.assertTrue(renew_claim(self.mailing.id, first))
+
+        # Аренда первого воркера истекла, рассылку захватил второй
+        self.expire_lease()
+        second = claim_mailing(self.mailing.id)
+        self.assertNotIn(second, (None, first))
+        lease = self.claimed_until()
+
+        with self.assertLogs("mailing.services", "WARNING"):
+            self.assertFalse(renew_claim(self.mailing.id, first))
+        self.assertEqual(self.claimed_until(), lease)
+        release_mailing(self.mailing.id, first)
+        self.assertEqual(self.claimed_until(), lease)
+
+        self.assertTrue(renew_claim(self.mailing.id, second))
+        self.assertGreaterEqual(self.claimed_until(), lease)
+        release_mailing(self.mailing.id, second)
+        self.assertIsNone(self.claimed_until())
+        with self.assertLogs("mailing.services", "WARNING"):
+            self.assertFalse(renew_claim(self.mailing.id, second))
+
+    def test_delivery_renews_only_own_claim(self):
+        self.create_clients(["client@claim.example"], self.mailing)
+        claim = claim_mailing(self.mailing.id)
+        self.expire_lease()
+        stolen = claim_mailing(self.mailing.id)
+        lease = self.claimed_until()
+
+        with FakeSMTPServer() as server, smtp_settings(server), self.assertLogs("mailing.services", "WARNING"):
+            deliver(Mailing.objects.get(id=self.mailing.id), claim=claim)
+        self.assertEqual(self.claimed_until(), lease)
+        self.assertTrue(renew_claim(self.mailing.id, stolen))
+
+
+class ThreadedDeliveryEngineTest(SimpleTestCase):
+    """
+    Проверяет параллельную отправку на заглушке SMTP с задержкой:
+    результаты возвращаются в порядке писем, ошибки отдельных писем не
+    мешают остальным, соединений открывается не больше concurrency.
+    """
+
+    def test_parallel_send(self):
+        emails = [f"client{i}@threads.example" for i in range(12)]
+        rejected = {emails[2], emails[7]}
+        messages = [EmailMessage("Тема", "Текст", to=[email]) for email in emails]
+        with FakeSMTPServer(latency=0.02, reject=rejected) as server:
+            engine = ThreadedDeliveryEngine(
+                concurrency=3,
+                backend="django.core.mail.backends.smtp.EmailBackend",
+                host=server.host,
+                port=server.port,
+            )
+            with engine:
+                errors = engine.send_messages(messages)
+
+        self.assertEqual(
+            [email for email, error in zip(emails, errors) if error is not None],
+            [emails[2], emails[7]],
+        )
+        self.assertEqual(server.message_count, 10)
+        self.assertGreater(server.connection_count, 1)
+        self.assertLessEqual(server.connection_count, 3)
+
+
+class FanoutTest(MailingTestCase):
+    """
+    Проверяет раздачу рассылки частями через chord в режиме eager: все
+    получатели получают письмо, finalize_mailing снимает аренду и
+    завершает запуск.
+    """
+
+    MAILING_FIELDS = {"status": "running", "periodicity": "daily"}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_clients(
+            (f"client{i}@{domain}" for domain in ("a.example", "b.example") for i in range(3)),
+            cls.mailing,
+        )
+
+    def setUp(self):
+        super().setUp()
+        conf = start_mailing.app.conf
+        self.addCleanup(
+            conf.update,
+            task_always_eager=conf.task_always_eager,
+            task_eager_propagates=conf.task_eager_propagates,
+        )
+        conf.update(task_always_eager=True, task_eager_propagates=True)
+
+    def test_chord_finalizes_run(self):
+        for by_domain in (False, True):
+            with self.subTest(by_domain=by_domain), FakeSMTPServer() as server, smtp_settings(
+                server,
+                MAILING_FANOUT=True,
+                MAILING_FANOUT_BY_DOMAIN=by_domain,
+                MAILING_FANOUT_CHUNK_SIZE=2,
+                MAILING_DOMAIN_PARTITION_MIN_SIZE=3,
+            ), self.captureOnCommitCallbacks(execute=True):
+                self.assertTrue(run_mailing(self.mailing.id))
+
+                self.assertEqual(server.message_count, 6)
+                mailing = Mailing.objects.get(id=self.mailing.id)
+                self.assertIsNone(mailing.claimed_until)
+                self.assertEqual(mailing.run_number, 1 + by_domain)
+                self.assertGreater(mailing.next_run_at, timezone.now())
@@ -8,6 +8,7 @@ urlpatterns = [
     path("", views.home, name="home"),
     path("clients/", views.ClientListView.as_view(), name="client_list"),
     path("clients/create/", views.ClientCreateView.as_view(), name="client_create"),
+    path("clients/import/", views.ClientImportView.as_view(), name="client_import"),
     path("clients/<int:pk>/", views.ClientDetailView.as_view(), name="client_detail"),
     path(
         "clients/<int:pk>/update/",
@@ -50,6 +51,17 @@ urlpatterns = [
         name="mailing_delete",
     ),
     path("attempts/", views.MailingAttemptListView.as_view(), name="attempt_list"),
+    path(
+        "attempts/export/",
+        views.MailingAttemptExportView.as_view(),
+        name="attempt_export",
+    ),
     path("statistics/", views.MailingStatisticsView.as_view(), name="statistics"),
+    path(
+        "statistics/timeseries/",
+        views.MailingTimeseriesView.as_view(),
+        name="statistics_timeseries",
+    ),
     path('mailings/<int:mailing_id>/send/', views.send_mailing_view, name='send_mailing'),
+    path("metrics/", views.MetricsView.as_view(), name="metrics"),
 ]
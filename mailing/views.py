@@ -1,21 +1,37 @@
+import io
+from datetime import timedelta
+
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.cache import cache
-from django.db.models import Count, Q
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse_lazy
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.text import compress_sequence
 
 from django.views.generic import (
     CreateView,
     DeleteView,
     DetailView,
+    FormView,
     ListView,
     UpdateView,
+    View,
 )
 
-from .forms import ClientForm, MailingForm, MessageForm
+from .exporters import CONTENT_TYPES, export_lines, filter_attempts
+from .forms import AttemptExportForm, ClientForm, ClientImportForm, MailingForm, MessageForm
+from .importers import import_clients
+from .metrics import REGISTRY
 from .models import Client, Mailing, MailingAttempt, Message
+from .pagination import KeysetPaginationMixin
+from .rollups import timeseries
+from .services import schedule_mailing
+from .stats import get_home_stats
 
 from .tasks import send_single_mailing
 
@@ -26,7 +42,9 @@ def send_mailing_view(request, mailing_id):
     FBV для отправки рассылки.
     Проверяет права, обрабатывает GET (показ подтверждения) и POST (запуск задачи).
     """
-    mailing = get_object_or_404(Mailing, id=mailing_id, owner=request.user)
+    mailing = get_object_or_404(
+        Mailing.objects.select_related("message"), id=mailing_id, owner=request.user
+    )
 
     if not (mailing.owner == request.user or request.user.has_perm("mailing.set_mailing_status")):
         messages.error(request, "У вас нет прав для отправки этой рассылки.")
@@ -47,28 +65,7 @@ def send_mailing_view(request, mailing_id):
 
 
 def home(request):
-    cache_key = "home_stats_general"
-
-    cached_stats = cache.get(cache_key)
-
-    if cached_stats is None:
-
-        total_mailings = Mailing.objects.count()
-        active_mailings = Mailing.objects.filter(status="running").count()
-        unique_clients = Client.objects.count()
-
-        context = {
-            "total_mailings": total_mailings,
-            "active_mailings": active_mailings,
-            "unique_clients": unique_clients,
-        }
-
-        cache.set(cache_key, context, 900)
-        print("Статистика вычислена и сохранена в кеш")
-    else:
-        context = cached_stats
-        print("Статистика получена из кеша")
-
+    context = get_home_stats()
     return render(request, "mailing/home.html", context)
 
 
@@ -82,7 +79,7 @@ class OwnerRequiredMixin:
         return queryset.filter(owner=self.request.user)
 
 
-class ClientListView(LoginRequiredMixin, OwnerRequiredMixin, ListView):
+class ClientListView(LoginRequiredMixin, OwnerRequiredMixin, KeysetPaginationMixin, ListView):
     model = Client
     template_name = "mailing/client_list.html"
     context_object_name = "clients"
@@ -123,7 +120,34 @@ class ClientDeleteView(LoginRequiredMixin, OwnerRequiredMixin, DeleteView):
     login_url = "users:login"
 
 
-class MessageListView(LoginRequiredMixin, OwnerRequiredMixin, ListView):
+class ClientImportView(LoginRequiredMixin, FormView):
+    """
+    Загрузка клиентов из CSV. Файл читается потоково и вставляется пачками.
+    """
+
+    form_class = ClientImportForm
+    template_name = "mailing/client_import.html"
+    success_url = reverse_lazy("mailing:client_list")
+    login_url = "users:login"
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["owner_id"] = self.request.user.id
+        return kwargs
+
+    def form_valid(self, form):
+        stream = io.TextIOWrapper(form.cleaned_data["file"].file, encoding="utf-8-sig", newline="")
+        try:
+            result = import_clients(stream, self.request.user, form.cleaned_data["mailing"])
+        except (UnicodeDecodeError, ValueError) as e:
+            form.add_error("file", f"Не удалось импортировать файл: {e}")
+            return self.form_invalid(form)
+
+        messages.success(self.request, f"Импорт завершён. {result}")
+        return super().form_valid(form)
+
+
+class MessageListView(LoginRequiredMixin, OwnerRequiredMixin, KeysetPaginationMixin, ListView):
     model = Message
     template_name = "mailing/message_list.html"
     context_object_name = "messages"
@@ -164,7 +188,7 @@ class MessageDeleteView(LoginRequiredMixin, OwnerRequiredMixin, DeleteView):
     login_url = "users:login"
 
 
-class MailingListView(LoginRequiredMixin, ListView):  # Для всех или с проверкой прав
+class MailingListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):  # Для всех или с проверкой прав
     model = Mailing
     template_name = "mailing/mailing_list.html"
     context_object_name = "mailings"
@@ -172,16 +196,18 @@ class MailingListView(LoginRequiredMixin, ListView):  # Для всех или 
 
     def get_queryset(self):
         user = self.request.user
+        queryset = Mailing.objects.select_related("message")
         if user.has_perm("mailing.view_mailing_list"):
 
-            return Mailing.objects.all()
+            return queryset
         else:
 
-            return Mailing.objects.filter(owner=user)
+            return queryset.filter(owner=user)
 
 
 class MailingDetailView(LoginRequiredMixin, OwnerRequiredMixin, DetailView):
     model = Mailing
+    queryset = Mailing.objects.select_related("message")
     template_name = "mailing/mailing_detail.html"
     context_object_name = "mailing"
     login_url = "users:login"
@@ -201,7 +227,9 @@ class MailingCreateView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         form.instance.owner = self.request.user
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        schedule_mailing(self.object)
+        return response
 
 
 class MailingUpdateView(LoginRequiredMixin, OwnerRequiredMixin, UpdateView):
@@ -216,20 +244,28 @@ class MailingUpdateView(LoginRequiredMixin, OwnerRequiredMixin, UpdateView):
         kwargs["owner_id"] = self.request.user.id
         return kwargs
 
+    def form_valid(self, form):
+        # Время запуска могло измениться: прежняя задача отзывается
+        response = super().form_valid(form)
+        schedule_mailing(self.object)
+        return response
+
 
 class MailingDeleteView(LoginRequiredMixin, OwnerRequiredMixin, DeleteView):
     model = Mailing
+    queryset = Mailing.objects.select_related("message")
     template_name = "mailing/mailing_confirm_delete.html"
     success_url = reverse_lazy("mailing:mailing_list")
     login_url = "users:login"
 
 
 # --- Список попыток (MailingAttempt) ---
-class MailingAttemptListView(LoginRequiredMixin, ListView):
+class MailingAttemptListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = MailingAttempt
     template_name = "mailing/attempt_list.html"
     context_object_name = "attempts"
     login_url = "users:login"
+    keyset_ordering = ("-attempt_time", "-id")
 
     def get_queryset(self):
         user = self.request.user
@@ -241,7 +277,46 @@ class MailingAttemptListView(LoginRequiredMixin, ListView):
             return MailingAttempt.objects.filter(mailing__owner=user)
 
 
-class MailingStatisticsView(LoginRequiredMixin, ListView):
+class MailingAttemptExportView(LoginRequiredMixin, View):
+    """
+    Потоковая выгрузка попыток в CSV или JSONL, при ?gzip=1 — сжатая.
+    Фильтры: ?mailing=ID&owner=ID&status=...&since=...&until=....
+    Права те же, что у списка попыток: без view_mailing_list видны
+    только попытки своих рассылок.
+    """
+
+    login_url = "users:login"
+
+    def get(self, request):
+        form = AttemptExportForm(request.GET)
+        if not form.is_valid():
+            return JsonResponse({"errors": form.errors}, status=400)
+        filters = form.cleaned_data
+
+        owner_id = filters["owner"]
+        if not request.user.has_perm("mailing.view_mailing_list"):
+            owner_id = request.user.id
+        attempts = filter_attempts(
+            mailing_id=filters["mailing"],
+            owner_id=owner_id,
+            status=filters["status"],
+            since=filters["since"],
+            until=filters["until"],
+        )
+
+        export_format = filters["format"] or "csv"
+        content = (line.encode() for line in export_lines(attempts, export_format))
+        filename = f"attempts.{export_format}"
+        if filters["gzip"]:
+            content = compress_sequence(content)
+            filename += ".gz"
+
+        response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[export_format])
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class MailingStatisticsView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Mailing
     template_name = "mailing/statistics.html"
     context_object_name = "mailings"
@@ -249,16 +324,87 @@ class MailingStatisticsView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         user = self.request.user
-        if user.has_perm("mailing.view_mailing_list"):
+        queryset = Mailing.objects.select_related("message")
+        if not user.has_perm("mailing.view_mailing_list"):
 
-            queryset = Mailing.objects.all()
-        else:
+            queryset = queryset.filter(owner=user)
 
-            queryset = Mailing.objects.filter(owner=user)
+        # Счётчики попыток хранятся в самой рассылке
+        return queryset
 
-        queryset = queryset.annotate(
-            total_attempts=Count("mailingattempt"),
-            successful_attempts=Count("mailingattempt", filter=Q(mailingattempt__status="success")),
-            failed_attempts=Count("mailingattempt", filter=Q(mailingattempt__status="failed"))
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        owner = statistics_owner(self.request.user)
+        now = timezone.now()
+        context["daily_series"] = serialize_series(
+            timeseries("day", now - timedelta(days=30), owner)
         )
-        return queryset
+        context["hourly_series"] = serialize_series(
+            timeseries("hour", now - timedelta(hours=48), owner)
+        )
+        return context
+
+
+def statistics_owner(user):
+    """
+    Владелец, по которому фильтруется статистика (None — по всем владельцам).
+    """
+    return None if user.has_perm("mailing.view_mailing_list") else user
+
+
+def serialize_series(series):
+    return [
+        {
+            "bucket_start": row["bucket_start"].isoformat(),
+            "successful": row["successful"],
+            "failed": row["failed"],
+        }
+        for row in series
+    ]
+
+
+class MailingTimeseriesView(LoginRequiredMixin, View):
+    """
+    Ряд статистики попыток в JSON: ?period=hour|day&days=N&mailing=ID.
+    Читает только агрегированную статистику.
+    """
+
+    login_url = "users:login"
+
+    def get(self, request):
+        period = request.GET.get("period", "day")
+        if period not in ("hour", "day"):
+            return JsonResponse({"error": "period должен быть hour или day"}, status=400)
+        try:
+            days = min(int(request.GET.get("days", 30)), 366)
+            mailing_id = int(request.GET["mailing"]) if request.GET.get("mailing") else None
+        except ValueError:
+            return JsonResponse({"error": "Некорректные параметры"}, status=400)
+
+        series = timeseries(
+            period,
+            timezone.now() - timedelta(days=days),
+            statistics_owner(request.user),
+            mailing_id,
+        )
+        return JsonResponse({"period": period, "series": serialize_series(series)})
+
+
+class MetricsView(View):
+    """
+    Метрики отправки, планировщика и страниц в текстовом формате Prometheus,
+    суммированные по всем процессам. Доступ — по токену
+    MAILING_METRICS_TOKEN в заголовке Authorization или после входа.
+    """
+
+    login_url = "users:login"
+
+    def has_token(self, request):
+        token = settings.MAILING_METRICS_TOKEN
+        header = request.headers.get("Authorization", "")
+        return bool(token) and constant_time_compare(header, f"Bearer {token}")
+
+    def get(self, request):
+        if not (self.has_token(request) or request.user.is_authenticated):
+            return redirect_to_login(request.get_full_path(), self.login_url)
+        return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")